@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+import pymongo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--uri", help="mongo db server",
+                    default="mongodb://localhost:27017/")
+parser.add_argument("--locations", help="number of xytech locations",
+                    type=int, default=1000)
+parser.add_argument("--machine-files", help="number of baselight and of flame files",
+                    type=int, default=4)
+parser.add_argument("--lines", help="number of lines per machine file",
+                    type=int, default=5000)
+parser.add_argument("--batch-size", help="rows per bulk write", type=int, default=1000)
+parser.add_argument("--concurrency", help="writes and queries in flight at once",
+                    type=int, default=4)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# writes a work order of the 23rd and baselight and flame files of several users
+# whose lines reference its locations
+def generateWorkOrder(directory, locationCount, machineFileCount, lineCount, seed):
+    rng = random.Random(seed)
+    paths = [f"Show/reel{i // 100}/shot_{i}/1920x1080" for i in range(locationCount)]
+    xytechFile = os.path.join(directory, "Xytech_20230323.txt")
+    with open(xytechFile, "w") as f:
+        f.write("Xytech Workorder 1\n\nProducer: Joan Jett\nOperator: Shane Mand\n"
+                "Job: Dirtfixing\n\n\nLocation:\n")
+        for path in paths:
+            f.write(f"/ddnsata{rng.randint(1, 9)}/production/{path}\n")
+        f.write("\n\nNotes:\nPlease clean files noted per Colorist\n")
+
+    machineFiles = []
+    for fileNumber in range(machineFileCount):
+        for machine, prefix in (("Baselight", "/images1/"), ("Flame", "/net/flame-archive ")):
+            user = ("TDanza", "DFlowers", "MFelix", "JJacobs")[fileNumber % 4] + str(fileNumber)
+            machineFile = os.path.join(directory, f"{machine}_{user}_20230323.txt")
+            with open(machineFile, "w") as f:
+                for _ in range(lineCount):
+                    frame = rng.randint(1, 100000)
+                    frames = " ".join(str(frame + step) for step in range(rng.randint(1, 30)))
+                    f.write(f"{prefix}{rng.choice(paths)} {frames}\n")
+            machineFiles.append(machineFile)
+    return xytechFile, machineFiles
+
+
+# stores the work order and prints the reports, returning the printed reports
+def runPipeline(pipeline, xytechFile, machineFiles):
+    videoFiles = main.myClient["videoFiles"]
+    for collection in ("frame", "employee"):
+        videoFiles[collection].drop()
+    reports = io.StringIO()
+    with contextlib.redirect_stdout(reports):
+        if pipeline == "async":
+            asyncio.run(main.storeInMongoDBAsync(
+                xytechFile, machineFiles, args.batch_size, False, args.concurrency))
+            asyncio.run(main.printReportsAsync(videoFiles, args.concurrency))
+        else:
+            xytech = main.parseXytechInfo(main.readFileLines(xytechFile))
+            parsedFiles = {os.path.basename(file): main.parseMachineFile(file)
+                           for file in machineFiles}
+            main.storeInMongoDB(xytech, parsedFiles, args.batch_size)
+            main.printReports(videoFiles)
+    return reports.getvalue()
+
+
+main.myClient = helpers.BenchmarkClient(pymongo.MongoClient(args.uri))
+
+with tempfile.TemporaryDirectory() as directory:
+    xytechFile, machineFiles = generateWorkOrder(
+        directory, args.locations, args.machine_files, args.lines, args.seed)
+    print(f"{len(machineFiles)} machine files of {args.lines} lines, "
+          f"{args.locations} locations")
+
+    outputs = {}
+    for pipeline in ("serial", "async"):
+        outputs[pipeline], elapsed = helpers.timeIt(
+            lambda: runPipeline(pipeline, xytechFile, machineFiles))
+        print(f"{pipeline}: {elapsed:.2f}s")
+
+main.myClient.client.drop_database("benchmarkVideoFiles")
+main.myClient.close()
+
+# the rows are written in a different order, so the documents of a report can be
+# listed in another order; the reports and their lines must be the same
+titles = {pipeline: [line for line in output.splitlines() if line[:1].isdigit()]
+          for pipeline, output in outputs.items()}
+if (titles["serial"] != titles["async"] or
+        sorted(outputs["serial"].splitlines()) != sorted(outputs["async"].splitlines())):
+    print("the async pipeline does not print the same reports")
+    sys.exit(1)
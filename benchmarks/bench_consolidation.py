@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import generators
+import helpers
+
+parser = argparse.ArgumentParser(
+    description="compares the CSV output and the frame rows of a work order whose colorists "
+    "worked on the same shots with and without --consolidate")
+parser.add_argument("--users", help="number of baselight files of the work order",
+                    type=int, default=4)
+parser.add_argument("--size", help="size of each machine file: kb, mb, gb or a number of bytes",
+                    default="mb")
+parser.add_argument("--overlap", help="share of the lines of a file also in the other files",
+                    type=float, default=0.5)
+parser.add_argument("--locations", help="number of xytech locations", type=int, default=1000)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+main.args.parse_cache = ""
+
+
+# writes a work order of baselight files of several users: every file keeps the
+# overlap share of the lines of a file shared by all of them and adds its own
+def generateOverlappingWorkOrder(directory, userCount, bytesPerFile, overlap, locationCount,
+                                 seed):
+    paths = generators.locationPaths(locationCount, seed)
+    xytechFile = os.path.join(directory, "Xytech_20230323.txt")
+    generators.writeXytechFile(xytechFile, paths, seed)
+    sharedFile = os.path.join(directory, "shared.txt")
+    generators.writeMachineFile(sharedFile, "Baselight", paths,
+                                generators.parseSize(bytesPerFile), seed)
+    rng = random.Random(seed)
+    machineFiles = []
+    for user in range(userCount):
+        ownFile = os.path.join(directory, "own.txt")
+        generators.writeMachineFile(ownFile, "Baselight", paths,
+                                    generators.parseSize(bytesPerFile), seed + user + 1)
+        machineFile = os.path.join(directory, f"Baselight_User{user}_20230323.txt")
+        with open(sharedFile) as shared, open(ownFile) as own, open(machineFile, "w") as f:
+            for sharedLine, ownLine in zip(shared, own):
+                f.write(sharedLine if rng.random() < overlap else ownLine)
+        machineFiles.append(machineFile)
+    os.remove(sharedFile)
+    os.remove(ownFile)
+    return xytechFile, machineFiles
+
+
+with tempfile.TemporaryDirectory() as directory:
+    xytechFile, machineFiles = generateOverlappingWorkOrder(
+        directory, args.users, args.size, args.overlap, args.locations, args.seed)
+    xytech, parsedFiles, _ = main.parseWorkOrder(xytechFile, machineFiles)
+    frameCount = sum(len(frames) for parsedFile in parsedFiles.values()
+                     for frames in parsedFile.values())
+    print(f"{args.users} files, {frameCount} frames, {args.overlap:.0%} of the lines shared")
+
+    rangeCount = sum(sum(1 for _ in records)
+                     for records in main.mergeMachineFilesByPath(xytech, parsedFiles).values())
+    consolidatedCount = sum(1 for _ in main.consolidateRanges(
+        main.mergeMachineFilesByPath(xytech, parsedFiles).items()))
+    print(f"frame rows: {rangeCount} per file, {consolidatedCount} consolidated "
+          f"({1 - consolidatedCount / rangeCount:.0%} fewer)")
+
+    for name, consolidate in (("per file", False), ("consolidated", True)):
+        os.mkdir(os.path.join(directory, name))
+        os.chdir(os.path.join(directory, name))
+        tracemalloc.start()
+        _, elapsed = helpers.timeIt(lambda: main.createCSVFile(xytech, parsedFiles, consolidate))
+        peakBytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"csv {name}: {elapsed:.2f}s, peak {peakBytes / 2 ** 20:.0f} MB allocated, "
+              f"{os.path.getsize('output_20230323.csv')} bytes")
+    os.chdir(os.path.dirname(directory))
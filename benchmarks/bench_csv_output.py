@@ -0,0 +1,115 @@
+import argparse
+import array
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--frames", help="number of frames over all the machine files",
+                    type=int, default=10000000)
+parser.add_argument("--locations", help="number of xytech locations",
+                    type=int, default=1000)
+parser.add_argument("--density", help="chance that a frame continues the run",
+                    type=float, default=0.9)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# the string building merge and csv writer used before the streaming writer,
+# kept as the reference for the output bytes
+def referenceMerge(xytech, otherFile, machine):
+    stringBuilder = ""
+    for location in xytech['Location']:
+        firstPath = location.split("/")[1]
+        pathToMatch = "/".join(location.split("/")[3:])
+        for key, item in otherFile.items():
+            sec, filePath = key.split(" ") if machine == "Flame" else ("", key)
+            if pathToMatch == filePath:
+                for frame in main.framesAsRangesReference(item, 1):
+                    stringBuilder += (sec + " " if machine == "Flame" else "") + \
+                        firstPath + "/" + pathToMatch + "," + frame + "\n"
+    return stringBuilder
+
+
+def referenceCSVFile(xytech, files):
+    xytechKeys = [key for key in xytech.keys() if key != "Location"]
+    locationsAndFrames = ""
+    dateOfFiles = ""
+    for key, file in files.items():
+        dateOfFiles = key.split("_")[2].split(".")[0]
+        currentFile = referenceMerge(xytech, file, key.split("_")[0])
+        currentFile = sorted(currentFile.splitlines(
+        ), key=lambda x: int(x.split(",")[1].split("-")[0]))
+        locationsAndFrames = locationsAndFrames + "\n" + "\n".join(currentFile)
+
+    columns = ""
+    for key in xytechKeys:
+        if not isinstance(xytech[key], list):
+            columns += xytech[key] + ","
+    notes = ""
+    for key in xytechKeys:
+        if isinstance(xytech[key], list):
+            for value in xytech[key]:
+                notes += columns + value + "\n"
+
+    with open("output_" + dateOfFiles + ".csv", "w") as f:
+        f.write(notes + "\n")
+        f.write(locationsAndFrames)
+
+
+# generates a work order and one baselight and one flame file sharing its locations
+def generateInputs(frameCount, locationCount, density, seed):
+    rng = random.Random(seed)
+    paths = [f"Show/reel{i // 100}/shot_{i}/1920x1080" for i in range(locationCount)]
+    xytech = {
+        "Producer": "Joan Jett",
+        "Operator": "Shane Mand",
+        "Job": "Dirtfixing",
+        "Location": [f"/ddnsata{rng.randint(1, 9)}/production/{path}" for path in paths],
+        "Notes": ["Please clean files noted per Colorist Bench"],
+    }
+    framesPerFile = frameCount // 2
+    files = {}
+    for machine, prefix in (("Baselight", ""), ("Flame", "net/flame-archive ")):
+        otherFile = {prefix + path: array.array('I') for path in paths}
+        keys = list(otherFile)
+        framesPerLocation = framesPerFile // locationCount
+        for key in keys:
+            frames = otherFile[key]
+            frame = rng.randint(0, 1000)
+            for _ in range(framesPerLocation):
+                frame += 1 if rng.random() < density else rng.randint(2, 50)
+                frames.append(frame)
+        files[f"{machine}_Bench_20230323.txt"] = otherFile
+    return xytech, files
+
+
+xytech, files = generateInputs(args.frames, args.locations, args.density, args.seed)
+print(f"{args.frames} frames over {args.locations} locations")
+
+with tempfile.TemporaryDirectory() as directory:
+    outputs = {}
+    for name, createCSV in (("string building", referenceCSVFile),
+                            ("streaming csv writer", main.createCSVFile)):
+        os.mkdir(os.path.join(directory, name))
+        os.chdir(os.path.join(directory, name))
+        tracemalloc.start()
+        _, elapsed = helpers.timeIt(lambda: createCSV(xytech, files))
+        peakBytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open("output_20230323.csv", "rb") as f:
+            outputs[name] = f.read()
+        print(f"{name}: {elapsed:.2f}s, peak {peakBytes / 2 ** 20:.0f} MB allocated, "
+              f"{len(outputs[name])} bytes")
+    os.chdir(os.path.dirname(directory))
+
+if len(set(outputs.values())) != 1:
+    print("the streaming csv writer does not write the same bytes")
+    sys.exit(1)
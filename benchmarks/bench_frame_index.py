@@ -0,0 +1,128 @@
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser(
+    description="compares the frame index of the query workflow with the range query of "
+    "the frame collection")
+parser.add_argument("--mongo", help="database of the frame collection: a mongod at --uri or "
+                    "mongomock", choices=["mongod", "mongomock"], default="mongod")
+parser.add_argument("--uri", help="mongo db server", default="mongodb://localhost:27017/")
+parser.add_argument("--ranges", help="number of frame ranges", type=int, default=1000000)
+parser.add_argument("--locations", help="number of locations", type=int, default=5000)
+parser.add_argument("--files", help="number of machine files the ranges come from",
+                    type=int, default=50)
+parser.add_argument("--queries", help="number of queries of each kind", type=int, default=200)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# the merged records of the machine files like mergeMachineFilesByPath: each file
+# holds the ranges of one user over random locations of a season of reels
+def generateMergedFiles(rangeCount, locationCount, fileCount, seed):
+    rng = random.Random(seed)
+    locations = [f"ddnsata{rng.randint(1, 9)}/Show/reel{i % 20 + 1}/shot_{i}/1920x1080"
+                 for i in range(locationCount)]
+    mergedFiles = []
+    for fileNumber in range(fileCount):
+        machine = "Flame" if fileNumber % 3 == 0 else "Baselight"
+        key = f"{machine}_User{fileNumber}_202303{fileNumber % 28 + 1:02d}.txt"
+        records = []
+        for _ in range(rangeCount // fileCount):
+            start = rng.randint(0, 100000)
+            records.append((rng.choice(locations), start, start + rng.randint(0, 50)))
+        mergedFiles.append((key, records))
+    return mergedFiles
+
+
+def frameCollection():
+    if args.mongo == "mongomock":
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        import pymongo
+        client = pymongo.MongoClient(args.uri)
+    client.drop_database("benchmarkVideoFiles")
+    return client, client["benchmarkVideoFiles"]["frame"]
+
+
+def insertFrames(collection, mergedFiles, batchSize=10000):
+    batch = []
+    for key, records in mergedFiles:
+        machine, user, date = key.split(".")[0].split("_")
+        for location, start, end in records:
+            batch.append(main.frameDocument(user, date, location, start, end, key, machine))
+            if len(batch) == batchSize:
+                collection.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    main.createFrameRangeIndex(collection)
+
+
+# the same query on the frame collection: the ranges of the locations containing
+# the text that overlap the frames
+def mongoQuery(collection, firstFrame, lastFrame, locationText):
+    return [(document["location"], document["frame_start"], document["frame_end"],
+             document["sourceFile"]) for document in collection.find({
+                 "location": {"$regex": re.escape(locationText)},
+                 "frame_start": {"$lte": lastFrame}, "frame_end": {"$gte": firstFrame}})]
+
+
+mergedFiles = generateMergedFiles(args.ranges, args.locations, args.files, args.seed)
+print(f"{sum(len(records) for _, records in mergedFiles)} ranges over "
+      f"{args.locations} locations")
+
+frameIndex, elapsed = helpers.timeIt(lambda: main.buildFrameIndex(mergedFiles))
+print(f"frame index build: {elapsed:.2f}s")
+with tempfile.TemporaryDirectory() as directory:
+    indexPath = os.path.join(directory, "frame-index.bin")
+    _, elapsed = helpers.timeIt(lambda: main.saveFrameIndex(indexPath, frameIndex))
+    print(f"frame index save: {elapsed:.3f}s, {os.path.getsize(indexPath)} bytes")
+    frameIndex, elapsed = helpers.timeIt(lambda: main.loadFrameIndex(indexPath))
+    print(f"frame index load: {elapsed:.3f}s")
+
+    client, collection = frameCollection()
+    _, elapsed = helpers.timeIt(lambda: insertFrames(collection, mergedFiles))
+    print(f"frame collection insert and index: {elapsed:.1f}s")
+
+    # a stabbing query of one frame and an overlap query of a hundred frames, on one
+    # reel and on one location
+    rng = random.Random(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        firstFrame = rng.randint(0, 100000)
+        reel = f"/reel{rng.randint(1, 20)}/"
+        location = mergedFiles[0][1][rng.randrange(len(mergedFiles[0][1]))][0]
+        queries.append(("stabbing on a reel", firstFrame, firstFrame, reel))
+        queries.append(("overlap on a reel", firstFrame, firstFrame + 100, reel))
+        queries.append(("overlap on a location", firstFrame, firstFrame + 100, location))
+
+    mismatches = 0
+    for kind in ("stabbing on a reel", "overlap on a reel", "overlap on a location"):
+        kindQueries = [query for query in queries if query[0] == kind]
+        indexResults, indexSeconds = helpers.timeIt(lambda: [
+            sorted(main.queryFrameIndex(frameIndex, *query[1:])) for query in kindQueries])
+        mongoResults, mongoSeconds = helpers.timeIt(lambda: [
+            sorted(mongoQuery(collection, *query[1:])) for query in kindQueries])
+        mismatches += sum(indexResult != mongoResult
+                          for indexResult, mongoResult in zip(indexResults, mongoResults))
+        print(f"{kind}: frame index {indexSeconds / len(kindQueries) * 1000:.3f} ms, "
+              f"{args.mongo} {mongoSeconds / len(kindQueries) * 1000:.3f} ms per query, "
+              f"{sum(map(len, indexResults)) / len(kindQueries):.1f} ranges")
+    frameIndex = None
+
+    client.drop_database("benchmarkVideoFiles")
+    client.close()
+
+if mismatches:
+    print(f"the frame index does not find the same ranges in {mismatches} queries")
+    sys.exit(1)
@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import sys
+
+import pymongo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--uri", help="mongo db server",
+                    default="mongodb://localhost:27017/")
+parser.add_argument("--documents", help="number of frame documents",
+                    type=int, default=1000000)
+parser.add_argument("--max-frame", help="last frame of the video",
+                    type=int, default=20000)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# generates frame documents in the old string-only schema; most of them are
+# past the end of the video like in a season of work orders
+def generateFrameDocuments(documentCount, seed):
+    rng = random.Random(seed)
+    for i in range(documentCount):
+        start = rng.randint(0, 2000000)
+        end = start + rng.choice((0, rng.randint(1, 50)))
+        yield {
+            "userOnFile": f"User{i % 50}",
+            "dateOfFile": f"2023-03-{1 + i % 28:02d}T00:00:00",
+            "location": f"ddnsata{i % 9}/Show/reel{i % 20}/1920x1080",
+            "frame_range": f"{start}-{end}" if start != end else str(start)
+        }
+
+
+# the $regex and $where query used before the numeric fields
+def whereQuery(collection, maxFrame):
+    findWhenRanges = f"Number(this.frame_range.split('-')[1]) <= {maxFrame} && Number(this.frame_range.split('-')[0]) >= 0"
+    return {"$or": [
+        {"frame_range": {"$regex": r"\d+-\d+"}, "$where": findWhenRanges}
+    ]}
+
+
+def docsExamined(collection, query):
+    explain = collection.find(query).explain()
+    return explain["executionStats"]["totalDocsExamined"]
+
+
+client = pymongo.MongoClient(args.uri)
+collection = client["benchmarkVideoFiles"]["frame"]
+collection.drop()
+
+_, elapsed = helpers.timeIt(lambda: helpers.insertInBatches(
+    collection, generateFrameDocuments(args.documents, args.seed)))
+print(f"inserted {args.documents} documents: {elapsed:.1f}s")
+
+query = whereQuery(collection, args.max_frame)
+before, elapsed = helpers.timeIt(lambda: list(collection.find(query)))
+print(f"before, $regex + $where: {elapsed:.3f}s, {len(before)} ranges, "
+      f"{docsExamined(collection, query)} documents examined")
+
+migrated, elapsed = helpers.timeIt(lambda: main.migrateFrameRanges(collection))
+print(f"migration of {migrated} documents and index: {elapsed:.1f}s")
+
+after, elapsed = helpers.timeIt(
+    lambda: main.findAllFramesWithinVideo(args.max_frame, collection))
+query = {"frame_end": {"$lte": args.max_frame}, "frame_start": {"$gte": 0}}
+print(f"after, indexed range query: {elapsed:.3f}s, {len(after)} ranges, "
+      f"{docsExamined(collection, query)} documents examined")
+
+collection.drop()
+client.close()
+
+if sorted(document["frame_range"] for document in before) != \
+        sorted(info["frameRange"] for info in after):
+    print("the indexed query does not find the same ranges")
+    sys.exit(1)
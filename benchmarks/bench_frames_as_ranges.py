@@ -0,0 +1,52 @@
+import argparse
+import array
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--frames", help="number of touched frames",
+                    type=int, default=5000000)
+parser.add_argument("--density", help="chance that a frame continues the run",
+                    type=float, default=0.9)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# generates sorted frames where most frames continue the current run
+def generateFrames(frameCount, density, seed):
+    rng = random.Random(seed)
+    frames = array.array('I')
+    frame = 0
+    for _ in range(frameCount):
+        frame += 1 if rng.random() < density else rng.randint(2, 100)
+        frames.append(frame)
+    return frames
+
+
+frames = generateFrames(args.frames, args.density, args.seed)
+print(f"{len(frames)} frames, numpy {'on' if main.loadNumpy() else 'off'}")
+
+reference, elapsed = helpers.timeIt(lambda: main.framesAsRangesReference(frames, 1))
+print(f"reference framesAsRanges: {elapsed:.3f}s, {len(reference)} ranges")
+
+(starts, ends), elapsed = helpers.timeIt(
+    lambda: main.framesAsRunBoundaries(frames, 1))
+print(f"run boundaries only: {elapsed:.3f}s")
+
+ranges, elapsed = helpers.timeIt(lambda: main.framesAsRanges(frames, 1))
+print(f"framesAsRanges with formatting: {elapsed:.3f}s")
+
+# a list of python ints holds a pointer and an int object per frame
+listBytes = sys.getsizeof(list(frames)) + len(frames) * sys.getsizeof(2 ** 20)
+print(f"frame storage: {frames.itemsize * len(frames)} bytes as array('I'), "
+      f"about {listBytes} bytes as list[int]")
+
+if ranges != reference:
+    print("framesAsRanges does not match the reference")
+    sys.exit(1)
@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--locations", help="number of xytech locations",
+                    type=int, default=100000)
+parser.add_argument("--entries", help="number of entries per machine file",
+                    type=int, default=500)
+parser.add_argument("--machine-files", help="number of machine files",
+                    type=int, default=5)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# the nested scan that was used before the location index, kept as the reference
+def nestedScanFlameMerge(xytech, otherFile):
+    locations = xytech['Location']
+    stringBuilder = ""
+    for location in locations:
+        firstPath = location.split("/")[1]
+        pathToMatch = "/".join(location.split("/")[3:])
+        for key, item in otherFile.items():
+            sec, filePath = key.split(" ")
+            if pathToMatch == filePath:
+                frames = main.framesAsRanges(item, 1)
+                for frame in frames:
+                    stringBuilder += sec + " " + firstPath + "/" + \
+                        "/".join(pathToMatch.split("/")) + "," + frame + "\n"
+    return stringBuilder
+
+
+# generates a xytech dictionary and flame files that reference some of its locations
+def generateInputs(locationCount, entryCount, machineFileCount, seed):
+    rng = random.Random(seed)
+    paths = [f"Show/reel{i // 1000}/shot_{i}/1920x1080"
+             for i in range(locationCount)]
+    xytech = {"Location": [f"/ddnsata{rng.randint(1, 9)}/production/{path}"
+                           for path in paths]}
+    files = {}
+    for fileNumber in range(machineFileCount):
+        otherFile = {}
+        for path in rng.sample(paths, entryCount):
+            start = rng.randint(1, 50000)
+            otherFile[f"net/flame-archive {path}"] = list(
+                range(start, start + rng.randint(1, 20)))
+        files[f"Flame_User{fileNumber}_20230323.txt"] = otherFile
+    return xytech, files
+
+
+xytech, files = generateInputs(
+    args.locations, args.entries, args.machine_files, args.seed)
+print(f"{args.locations} locations, {args.machine_files} flame files "
+      f"of {args.entries} entries")
+
+locationIndex, elapsed = helpers.timeIt(lambda: main.buildLocationIndex(xytech))
+print(f"build location index: {elapsed:.3f}s")
+
+merged, elapsed = helpers.timeIt(lambda: {
+    key: list(records) for key, records in
+    main.mergeMachineFilesByPath(xytech, files, locationIndex).items()})
+print(f"indexed merge of all files: {elapsed:.3f}s")
+
+# the nested scan is quadratic, so only time it on the first file
+firstKey = next(iter(files))
+reference, elapsed = helpers.timeIt(
+    lambda: nestedScanFlameMerge(xytech, files[firstKey]))
+print(f"nested scan merge of one file: {elapsed:.3f}s")
+
+if reference != "".join(f"{location},{main.formatFrameRange(start, end)}\n"
+                        for location, start, end in merged[firstKey]):
+    print("indexed merge does not match the nested scan")
+    sys.exit(1)
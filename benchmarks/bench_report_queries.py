@@ -0,0 +1,131 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+import pymongo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--uri", help="mongo db server",
+                    default="mongodb://localhost:27017/")
+parser.add_argument("--documents", help="number of frame documents",
+                    type=int, default=1000000)
+parser.add_argument("--users", help="number of users", type=int, default=50)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+args = parser.parse_args()
+
+
+# generates the employee and frame documents of a month of work orders, with the
+# machine and host stored on the frames
+def generateDocuments(documentCount, userCount, seed):
+    rng = random.Random(seed)
+    employees = {}
+    frames = []
+    for i in range(documentCount):
+        user = f"User{i % userCount}"
+        dateOfFile = datetime.datetime(2023, 3, 1 + i % 28).isoformat()
+        machine = "Flame" if (i % userCount) % 3 == 0 else "Baselight"
+        employees[(user, dateOfFile, machine)] = {
+            "userOnFile": user, "dateOfFile": dateOfFile, "machine": machine}
+        if rng.random() < 0.25:
+            host = f"hpsans{rng.randint(1, 20)}"
+        else:
+            host = f"ddnsata{rng.randint(1, 9)}"
+        location = f"{host}/Show/reel{rng.randint(1, 20)}/1920x1080"
+        if machine == "Flame":
+            location = "net/flame-archive " + location
+        start = rng.randint(0, 100000)
+        frames.append(main.frameDocument(user, dateOfFile, location, start,
+                                         start + rng.randint(0, 50), "bench", machine))
+    return list(employees.values()), frames
+
+
+# the $lookup and $regex reports used before the machine and host were stored
+def lookupBeforeDateAndMachine(collection, date, machine):
+    return collection.aggregate([
+        {"$lookup": {"from": "employee", "localField": "userOnFile",
+                     "foreignField": "userOnFile", "as": "emp"}},
+        {"$match": {"dateOfFile": {"$lt": date.isoformat()}, "emp.machine": machine}},
+    ])
+
+
+def regexOnAndDate(collection, host, date):
+    return collection.find(
+        {"location": {"$regex": ".*" + host + ".*"}, "dateOfFile": date.isoformat()})
+
+
+# the work summaries of the users, machines and hosts matching the query: the
+# number of frames and ranges and the first and last frame, one document per
+# user, machine, date and host
+def findWorkSummary(collection, query):
+    return collection.find(query, {"_id": 0})
+
+
+# the winning plan stage and the keys and documents examined by a find query
+def explainFind(cursor):
+    explain = cursor.explain()
+    stats = explain["executionStats"]
+    plan = explain["queryPlanner"]["winningPlan"]
+    while "inputStage" in plan and plan["stage"] in ("FETCH", "PROJECTION_SIMPLE",
+                                                     "PROJECTION_DEFAULT"):
+        plan = plan["inputStage"]
+    return (f"{plan['stage']}, {stats['totalKeysExamined']} keys and "
+            f"{stats['totalDocsExamined']} documents examined")
+
+
+client = pymongo.MongoClient(args.uri)
+videoFiles = client["benchmarkVideoFiles"]
+client.drop_database("benchmarkVideoFiles")
+
+employees, frames = generateDocuments(args.documents, args.users, args.seed)
+helpers.insertInBatches(videoFiles["employee"], employees)
+_, elapsed = helpers.timeIt(lambda: helpers.insertInBatches(videoFiles["frame"], frames))
+print(f"inserted {len(frames)} frame documents: {elapsed:.1f}s")
+videoFiles["employee"].create_index([("userOnFile", 1), ("dateOfFile", 1), ("machine", 1)])
+
+_, elapsed = helpers.timeIt(lambda: main.migrateWorkSummary(videoFiles))
+print(f"index step and work summary of "
+      f"{videoFiles['workSummary'].count_documents({})} documents: {elapsed:.1f}s")
+
+frameCollection = videoFiles["frame"]
+beforeDate = datetime.datetime(2023, 3, 25)
+onDate = datetime.datetime(2023, 3, 26)
+
+before, elapsed = helpers.timeIt(lambda: list(
+    lookupBeforeDateAndMachine(frameCollection, beforeDate, "Flame")))
+print(f"before date and machine, $lookup: {elapsed:.3f}s, {len(before)} rows")
+after, elapsed = helpers.timeIt(lambda: list(
+    main.findWorkDoneBeforeDateAndMachine(frameCollection, beforeDate, "Flame")))
+print(f"before date and machine, machine index: {elapsed:.3f}s, {len(after)} rows, "
+      + explainFind(main.findWorkDoneBeforeDateAndMachine(frameCollection, beforeDate, "Flame")))
+
+regexRows, elapsed = helpers.timeIt(lambda: list(
+    regexOnAndDate(frameCollection, "hpsans13", onDate)))
+print(f"on host and date, $regex: {elapsed:.3f}s, {len(regexRows)} rows, "
+      + explainFind(regexOnAndDate(frameCollection, "hpsans13", onDate)))
+hostRows, elapsed = helpers.timeIt(lambda: list(
+    main.findWorkDoneOnAndDate(frameCollection, "hpsans13", onDate)))
+print(f"on host and date, host index: {elapsed:.3f}s, {len(hostRows)} rows, "
+      + explainFind(main.findWorkDoneOnAndDate(frameCollection, "hpsans13", onDate)))
+
+summaryQuery = {"host": "hpsans13", "dateOfFile": onDate.isoformat()}
+summaries, elapsed = helpers.timeIt(lambda: list(
+    findWorkSummary(videoFiles["workSummary"], summaryQuery)))
+print(f"work summary of host and date: {elapsed:.4f}s, {len(summaries)} documents, "
+      + explainFind(findWorkSummary(videoFiles["workSummary"], summaryQuery)))
+
+client.drop_database("benchmarkVideoFiles")
+client.close()
+
+if (sorted(row["_id"] for row in before) != sorted(row["_id"] for row in after) or
+        sorted(row["_id"] for row in regexRows) != sorted(row["_id"] for row in hostRows) or
+        sum(summary["rangeCount"] for summary in summaries) != len(hostRows)):
+    print("the indexed reports do not find the same rows")
+    sys.exit(1)
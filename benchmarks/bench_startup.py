@@ -0,0 +1,88 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import generators
+
+mainDirectory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+mainScript = os.path.join(mainDirectory, "main.py")
+
+parser = argparse.ArgumentParser(
+    description="measures the import time of main.py with python -X importtime and the "
+    "wall time of a small CSV run")
+parser.add_argument("--locations", help="number of xytech locations", type=int, default=100)
+parser.add_argument("--size", help="size of each machine file: kb, mb, gb or a number of bytes",
+                    default="4096")
+parser.add_argument("--repeat", help="runs of the CSV workflow, the fastest one is kept",
+                    type=int, default=5)
+parser.add_argument("--target", help="seconds the small CSV run must finish in",
+                    type=float, default=0.2)
+args = parser.parse_args()
+
+# the backends a CSV run must not import
+deferredModules = ("pymongo", "xlsxwriter", "numpy", "ffmpy", "asyncio", "concurrent.futures",
+                   "cProfile")
+
+
+# imports main.py with -X importtime; returns the cumulative microseconds of main
+# and of each module it imports directly, and the names of all the imported modules
+def importTimes():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=mainDirectory, stderr=subprocess.PIPE, text=True, check=True)
+    # a module is listed after the modules it imports, one level deeper
+    children = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # the name follows a space and two spaces per level of nesting
+        name = name[1:]
+        if not cumulative.strip().isdigit():
+            continue
+        imported.add(name.strip())
+        if not name.startswith("  "):
+            if name.strip() == "main":
+                return int(cumulative), children, imported
+            children = {}
+        elif not name.startswith("   "):
+            children[name.strip()] = int(cumulative)
+    raise RuntimeError("main was not imported")
+
+
+# runs the command the number of times and returns the fastest wall time
+def fastestRun(command, repeat, directory):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=directory, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+mainMicroseconds, children, imported = importTimes()
+print(f"import main: {mainMicroseconds / 1000:.1f} ms")
+for name, microseconds in sorted(children.items(), key=lambda item: -item[1])[:5]:
+    print(f"  {name}: {microseconds / 1000:.1f} ms")
+
+with tempfile.TemporaryDirectory() as directory:
+    xytechFile, machineFiles = generators.generateWorkOrder(
+        os.path.join(directory, "inputs"), locationCount=args.locations,
+        bytesPerFile=args.size)
+    interpreterSeconds = fastestRun([sys.executable, "-c", "pass"], args.repeat, directory)
+    csvSeconds = fastestRun([sys.executable, mainScript, "csv", "--files", *machineFiles,
+                             "--xytech", xytechFile], args.repeat, directory)
+
+print(f"python startup: {interpreterSeconds:.3f}s")
+print(f"small CSV run: {csvSeconds:.3f}s (target {args.target:.3f}s)")
+
+failures = [f"{name} is imported by a CSV run" for name in deferredModules if name in imported]
+if csvSeconds > args.target:
+    failures.append(f"the small CSV run is slower than the {args.target:.3f}s target")
+for failure in failures:
+    print(failure)
+if failures:
+    sys.exit(1)
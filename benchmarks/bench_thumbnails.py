@@ -0,0 +1,70 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import helpers
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--seconds", help="length of the generated clip",
+                    type=int, default=30)
+parser.add_argument("--thumbnails", help="number of thumbnails to extract",
+                    type=int, default=60)
+parser.add_argument("--workers", help="workers of the parallel run",
+                    type=int, default=None)
+args = parser.parse_args()
+
+
+# generates a small synthetic clip with ffmpeg's testsrc at 60 frames per second
+def generateClip(path, seconds):
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i",
+                    f"testsrc=duration={seconds}:size=320x240:rate=60",
+                    "-pix_fmt", "yuv420p", "-y", path], check=True)
+
+
+# the per-frame extraction used before the keyframe index: -ss as an output option
+# decodes the video from its start up to the time code
+def outputSeekThumbnail(videoPath, frame):
+    seconds = main.ffmpegTime(main.frameTime(main.probeVideo(videoPath), frame))
+    return subprocess.run(["ffmpeg", "-v", "error", "-i", videoPath, "-ss", seconds,
+                           "-vframes", "1", "-s", main.thumbnail_size, "-f", "image2pipe",
+                           "-c:v", "png", "-"], check=True, stdout=subprocess.PIPE).stdout
+
+
+with tempfile.TemporaryDirectory() as directory:
+    clip = os.path.join(directory, "testsrc.mp4")
+    generateClip(clip, args.seconds)
+
+    lastFrame = args.seconds * main.frame_per_second - 1
+    step = lastFrame // args.thumbnails
+    tasks = list(range(step // 2, lastFrame, step))[:args.thumbnails]
+    print(f"{len(tasks)} thumbnails from a {args.seconds}s clip, "
+          f"{len(main.keyframeIndex(clip))} keyframes")
+
+    # the latency of one thumbnail near the start, the middle and the end of the clip
+    for name, extract in (("output seek", outputSeekThumbnail),
+                          ("keyframe seek", main.extractThumbnail)):
+        latencies = []
+        for frame in (tasks[0], tasks[len(tasks) // 2], tasks[-1]):
+            _, elapsed = helpers.timeIt(lambda: extract(clip, frame))
+            latencies.append(f"{elapsed:.3f}s")
+        print(f"{name} latency at start, middle, end: {', '.join(latencies)}")
+
+    runs = (
+        ("per-frame serial", lambda: main.extractThumbnails(clip, tasks, 1, timeout=60)),
+        ("per-frame parallel", lambda: main.extractThumbnails(
+            clip, tasks, args.workers, timeout=60)),
+        ("batch", lambda: main.extractThumbnailsInBatches(
+            clip, tasks, args.workers, timeout=60)),
+    )
+    for name, extract in runs:
+        results, elapsed = helpers.timeIt(lambda: list(extract()))
+        failed = [result for result in results if result[2]]
+        print(f"{name}: {elapsed:.2f}s, {len(failed)} failed")
+        if failed or [result[0] for result in results] != tasks:
+            print(f"{name} extraction did not return every thumbnail in order")
+            sys.exit(1)
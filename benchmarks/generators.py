@@ -0,0 +1,89 @@
+import os
+import random
+
+# deterministic generators of the xytech, baselight and flame files read by
+# main.py: the same parameters and seed always write the same bytes, so the
+# benchmarks of two versions run on the same inputs. The files are written line by
+# line, so a file of several GB never has to fit in memory
+
+# approximate size of each machine file for the named sizes
+sizes = {
+    "kb": 64 * 1024,
+    "mb": 8 * 1024 * 1024,
+    "gb": 1024 * 1024 * 1024,
+}
+
+# the archive prefixes of the flame lines
+flameArchivePrefixes = ("/net/flame-archive", "/net/flame-archive2", "/mnt/flame-nearline")
+
+
+# returns the size in bytes of a named size (kb, mb, gb) or of a number of bytes
+def parseSize(size):
+    if str(size).lower() in sizes:
+        return sizes[str(size).lower()]
+    return int(size)
+
+
+# the location paths shared by the xytech work order and the machine files:
+# show/reel/shot/resolution
+def locationPaths(locationCount, seed):
+    rng = random.Random(seed)
+    shows = ("Avatar", "Titanic", "Aliens", "Terminator")
+    return [f"{rng.choice(shows)}/reel{i // 200 + 1}/shot_{i}/"
+            f"{rng.choice(('1920x1080', '3840x2160', 'VFX'))}" for i in range(locationCount)]
+
+
+# writes a xytech work order listing every path on a random storage host
+def writeXytechFile(path, paths, seed, noteCount=2):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("Xytech Workorder 1110\n\nProducer: Joan Jett\nOperator: Shane Mand\n"
+                "Job: Dirtfixing\n\n\nLocation:\n")
+        for locationPath in paths:
+            f.write(f"/ddnsata{rng.randint(1, 9)}/production/{locationPath}\n")
+        f.write("\n\nNotes:\n")
+        for note in range(noteCount):
+            f.write(f"Please clean files noted per Colorist {note + 1}\n")
+
+
+# writes a baselight or flame file of about targetBytes: each line lists frames
+# of one path, where a frame continues the current run with the density chance and
+# jumps ahead otherwise; errorRate of the frames are written as <err>. The flame
+# lines start with one of archivePrefixes
+def writeMachineFile(path, machine, paths, targetBytes, seed, density=0.9,
+                     errorRate=0.01, framesPerLine=(1, 40),
+                     archivePrefixes=flameArchivePrefixes):
+    rng = random.Random(seed)
+    written = 0
+    with open(path, "w") as f:
+        while written < targetBytes:
+            locationPath = rng.choice(paths)
+            if machine == "Flame":
+                line = [f"{rng.choice(archivePrefixes)} {locationPath}"]
+            else:
+                line = [f"/images1/{locationPath}"]
+            frame = rng.randint(1, 20000)
+            for _ in range(rng.randint(*framesPerLine)):
+                frame += 1 if rng.random() < density else rng.randint(2, 100)
+                line.append("<err>" if rng.random() < errorRate else str(frame))
+            line = " ".join(line) + "\n"
+            f.write(line)
+            written += len(line)
+
+
+# writes a work order of the date and one machine file per (machine, user) into
+# the directory; returns the path of the xytech file and of the machine files
+def generateWorkOrder(directory, date="20230323", locationCount=1000,
+                      machineFiles=(("Baselight", "JJacobs"), ("Flame", "DFlowers")),
+                      bytesPerFile="kb", density=0.9, errorRate=0.01, seed=1):
+    os.makedirs(directory, exist_ok=True)
+    paths = locationPaths(locationCount, seed)
+    xytechFile = os.path.join(directory, f"Xytech_{date}.txt")
+    writeXytechFile(xytechFile, paths, seed)
+    machineFilePaths = []
+    for number, (machine, user) in enumerate(machineFiles):
+        machineFile = os.path.join(directory, f"{machine}_{user}_{date}.txt")
+        writeMachineFile(machineFile, machine, paths, parseSize(bytesPerFile),
+                         seed + number + 1, density, errorRate)
+        machineFilePaths.append(machineFile)
+    return xytechFile, machineFilePaths
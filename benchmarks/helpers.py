@@ -0,0 +1,35 @@
+import time
+
+# helpers shared by the benchmark scripts
+
+
+# runs the function once and returns its result and the seconds it took
+def timeIt(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+# the functions of main use the videoFiles database, the benchmarks point them to
+# benchmarkVideoFiles so they do not touch the stored work orders
+class BenchmarkClient:
+    def __init__(self, client):
+        self.client = client
+
+    def __getitem__(self, name):
+        return self.client["benchmark" + name[0].upper() + name[1:]]
+
+    def close(self):
+        self.client.close()
+
+
+# inserts the documents (a list or any iterable) in unordered batches of batchSize
+def insertInBatches(collection, documents, batchSize=10000):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batchSize:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
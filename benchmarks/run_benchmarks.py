@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import generators
+import helpers
+
+parser = argparse.ArgumentParser(
+    description="times each stage of main.py on generated inputs and compares the "
+    "times with a saved baseline")
+parser.add_argument("--size", help="size of each machine file: kb, mb, gb or a number of bytes",
+                    default="kb")
+parser.add_argument("--locations", help="number of xytech locations", type=int, default=1000)
+parser.add_argument("--density", help="chance that a frame continues the run",
+                    type=float, default=0.9)
+parser.add_argument("--error-rate", help="share of the frames written as <err>",
+                    type=float, default=0.01)
+parser.add_argument("--seed", help="random seed", type=int, default=1)
+parser.add_argument("--repeat", help="runs of each stage, the fastest one is kept",
+                    type=int, default=3)
+parser.add_argument("--stages", help="stages to run (default: all)", nargs="+")
+parser.add_argument("--mongo", help="database of the db stage: mongomock, a mongod at --uri "
+                    "or none to skip it", choices=["mongomock", "mongod", "none"],
+                    default="mongomock")
+parser.add_argument("--uri", help="mongo db server", default="mongodb://localhost:27017/")
+parser.add_argument("--baseline", help="json file of the baseline (default: "
+                    "benchmarks/baselines/<size>.json)")
+parser.add_argument("--save-baseline", help="save the times as the new baseline",
+                    action="store_true")
+parser.add_argument("--threshold", help="slowdown over the baseline reported as a regression, "
+                    "0.25 is 25%% slower", type=float, default=0.25)
+args = parser.parse_args()
+
+# the parse stages time the parsers, the parse cache has its own stage
+main.args.parse_cache = ""
+
+
+def benchmarkClient():
+    if args.mongo == "mongomock":
+        import mongomock
+        return helpers.BenchmarkClient(mongomock.MongoClient())
+    import pymongo
+    return helpers.BenchmarkClient(pymongo.MongoClient(args.uri))
+
+
+# the inputs parsed once for the stages that start after the parsing
+def parsedInputs(xytechFile, machineFiles):
+    xytech = main.parseXytechInfo(main.readFileLines(xytechFile))
+    files = {os.path.basename(file): main.parseMachineFile(file) for file in machineFiles}
+    return xytech, files
+
+
+# maps every machine file from the parse cache of the directory
+def loadCachedFiles(cacheDirectory, machineFiles):
+    return sum(len(main.loadParsedMachineFile(main.parseCachePath(cacheDirectory, file)))
+               for file in machineFiles)
+
+
+def countMergedRecords(xytech, files):
+    return sum(sum(1 for _ in records)
+               for records in main.mergeMachineFilesByPath(xytech, files).values())
+
+
+def writeCSV(directory, xytech, files):
+    os.chdir(directory)
+    main.createCSVFile(xytech, files)
+    with open(f"output_{next(iter(files)).split('_')[2].split('.')[0]}.csv") as f:
+        return sum(1 for _ in f)
+
+
+def storeInDatabase(xytech, files):
+    main.myClient = benchmarkClient()
+    main.myClient.client.drop_database("benchmarkVideoFiles")
+    summary = main.storeInMongoDB(xytech, files)
+    main.myClient.client.drop_database("benchmarkVideoFiles")
+    return summary["inserted"]
+
+
+def writeWorkbook(directory, xytech, files):
+    rows = ((location, main.formatFrameRange(start, end), "", None)
+            for records in main.mergeMachineFilesByPath(xytech, files).values()
+            for location, start, end in records)
+    return main.writeReport(os.path.join(directory, "report.xlsx"), rows)["rows"]
+
+
+# the stages by name: each one is a function of the generated files returning the
+# number of items it handled
+def benchmarkStages(directory, xytechFile, machineFiles):
+    baselightFiles = [file for file in machineFiles if "Baselight" in file]
+    flameFiles = [file for file in machineFiles if "Flame" in file]
+    inputs = {}
+
+    def parsed():
+        if not inputs:
+            inputs["parsed"] = parsedInputs(xytechFile, machineFiles)
+        return inputs["parsed"]
+
+    stages = {
+        "parse xytech": lambda: len(
+            main.parseXytechInfo(main.readFileLines(xytechFile))["Location"]),
+        "parse baselight": lambda: sum(
+            len(main.parseMachineFile(file)) for file in baselightFiles),
+        "parse flame": lambda: sum(len(main.parseMachineFile(file)) for file in flameFiles),
+        "range collapsing": lambda: sum(
+            len(main.framesAsRunBoundaries(frames, 1)[0])
+            for otherFile in parsed()[1].values() for frames in otherFile.values()),
+        "merge": lambda: countMergedRecords(*parsed()),
+        "csv output": lambda: writeCSV(directory, *parsed()),
+        "xls output": lambda: writeWorkbook(directory, *parsed()),
+    }
+    # the cache is written before the stage is timed, only its mapping is measured
+    if not args.stages or "parse cache" in args.stages:
+        cacheDirectory = os.path.join(directory, "parse-cache")
+        for file in machineFiles:
+            main.saveParsedMachineFile(main.parseCachePath(cacheDirectory, file),
+                                       parsed()[1][os.path.basename(file)])
+        stages["parse cache"] = lambda: loadCachedFiles(cacheDirectory, machineFiles)
+    if args.mongo != "none":
+        stages["db output"] = lambda: storeInDatabase(*parsed())
+    return stages
+
+
+# runs the stage repeat times and returns the fastest time and the items
+def timeStage(stage, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = stage()
+        times.append(time.perf_counter() - start)
+    return min(times), items
+
+
+baselinePath = args.baseline or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines", f"{args.size}.json")
+
+with tempfile.TemporaryDirectory() as directory:
+    xytechFile, machineFiles = generators.generateWorkOrder(
+        os.path.join(directory, "inputs"), locationCount=args.locations,
+        bytesPerFile=args.size, density=args.density, errorRate=args.error_rate,
+        seed=args.seed)
+    inputBytes = sum(os.path.getsize(file) for file in machineFiles)
+    print(f"{len(machineFiles)} machine files of {inputBytes / 2 ** 20:.1f} MB, "
+          f"{args.locations} locations, numpy {'on' if main.loadNumpy() else 'off'}")
+
+    results = {}
+    workingDirectory = os.getcwd()
+    for name, stage in benchmarkStages(directory, xytechFile, machineFiles).items():
+        if args.stages and name not in args.stages:
+            continue
+        seconds, items = timeStage(stage, args.repeat)
+        results[name] = {"seconds": seconds, "items": items}
+        print(f"{name}: {seconds:.4f}s, {items} items")
+    os.chdir(workingDirectory)
+
+# the parameters must match for the times to be compared with the baseline
+parameters = {"size": args.size, "locations": args.locations, "density": args.density,
+              "errorRate": args.error_rate, "seed": args.seed, "mongo": args.mongo}
+
+if args.save_baseline:
+    os.makedirs(os.path.dirname(baselinePath), exist_ok=True)
+    with open(baselinePath, "w") as f:
+        json.dump({"parameters": parameters, "python": platform.python_version(),
+                   "machine": platform.node(), "stages": results}, f, indent=1)
+    print(f"saved the baseline to {baselinePath}")
+    sys.exit(0)
+
+if not os.path.exists(baselinePath):
+    print(f"no baseline at {baselinePath}, save one with --save-baseline")
+    sys.exit(0)
+
+with open(baselinePath) as f:
+    baseline = json.load(f)
+if baseline["parameters"] != parameters:
+    print(f"the baseline was saved with other parameters: {baseline['parameters']}")
+    sys.exit(2)
+
+regressions = []
+for name, result in results.items():
+    if name not in baseline["stages"]:
+        continue
+    baselineSeconds = baseline["stages"][name]["seconds"]
+    change = result["seconds"] / baselineSeconds - 1 if baselineSeconds else 0
+    if result["items"] != baseline["stages"][name]["items"]:
+        print(f"{name}: {result['items']} items instead of {baseline['stages'][name]['items']}")
+        regressions.append(name)
+    elif change > args.threshold:
+        regressions.append(name)
+    print(f"{name}: {change:+.1%} against the baseline")
+
+if regressions:
+    print(f"regressions: {', '.join(regressions)}")
+    sys.exit(1)
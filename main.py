@@ -1,28 +1,379 @@
 import argparse
+import array
+import collections
+import bisect
+import contextlib
+import csv
 import sys
 import os
-import pymongo
 import datetime
-import ffmpy
+import fractions
+import gc
+import glob
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import operator
+import queue
+import resource
+import struct
 import subprocess
-import xlsxwriter
-
-parser = argparse.ArgumentParser()
-parser.add_argument(
+import threading
+import time
+
+# pymongo, xlsxwriter, numpy, asyncio, concurrent.futures and cProfile are
+# imported by the functions that use them, the first time they run, so a CSV run
+# does not wait for the database driver or the workbook writer to load
+
+# numpy is optional, it is only used to collapse the long runs of frames into
+# ranges faster; None until loadNumpy is first called
+numpy = None
+numpyLoaded = False
+
+# frame lists shorter than this are collapsed without numpy, which would cost
+# more to load and call than it saves on them
+numpyMinimumFrames = 256
+
+# imports numpy the first time it is needed; returns None when it is not installed
+def loadNumpy():
+    global numpy, numpyLoaded
+    if not numpyLoaded:
+        try:
+            import numpy as numpyModule
+        except ImportError:
+            numpyModule = None
+        numpy = numpyModule
+        numpyLoaded = True
+    return numpy
+
+# the options shared by the workflows
+options = argparse.ArgumentParser(add_help=False)
+options.add_argument(
     "--verbose", help="increase output verbosity", action="store_true")
-parser.add_argument("--files", help="list of files",
-                    nargs="+", required=False)
-parser.add_argument("--xytech", help="xytech file", required=False)
-parser.add_argument("--output", help="choose between DB or CSV output",
-                    choices=["DB", "CSV", "XLS"], required=True)
-parser.add_argument("--process", help="video processing", required=False)
-args = parser.parse_args()
+options.add_argument("--files", help="list of files",
+                     nargs="+", required=False)
+options.add_argument("--xytech", help="xytech file", required=False)
+options.add_argument("--process", help="video processing", required=False)
+options.add_argument("--batch", help="directory or glob of xytech and machine files; every "
+                     "machine file is processed with the xytech work order of its date",
+                     required=False)
+options.add_argument("--processes", help="number of work orders processed at once in batch mode "
+                     "(default: one per core)", type=int, default=None)
+options.add_argument("--workers", help="number of thumbnails extracted at once (default: one per core)",
+                     type=int, default=None)
+options.add_argument("--thumbnail-mode", help="extract all the thumbnails while decoding the video once "
+                     "(batch) or run ffmpeg once per thumbnail (per-frame)",
+                     choices=["batch", "per-frame"], default="batch")
+options.add_argument("--thumbnail-timeout", help="seconds before a thumbnail extraction is stopped",
+                     type=float, default=60)
+options.add_argument("--thumbnail-cache", help="directory of the thumbnails kept between runs "
+                     "(empty to disable the cache)",
+                     default=os.path.join(os.path.expanduser("~"), ".cache", "studio-workflow-auto"))
+options.add_argument("--thumbnail-cache-size", help="size limit of the thumbnail cache in MB",
+                     type=int, default=512)
+options.add_argument("--parse-cache", help="directory of the parsed machine files kept between "
+                     "runs, mapped instead of parsing a file again (empty to disable the cache)",
+                     default=os.path.join(os.path.expanduser("~"), ".cache",
+                                          "studio-workflow-auto-parsed"))
+options.add_argument("--parse-cache-size", help="size limit of the parse cache in MB",
+                     type=int, default=2048)
+options.add_argument("--consolidate", help="union the overlapping and adjacent ranges of each "
+                     "location across the machine files of a work order and write or store "
+                     "each range once with all its users (CSV and DB output)",
+                     action="store_true")
+options.add_argument("--index", help="frame index file of the query workflow, built from "
+                     "--xytech and --files or --batch when they are passed and read otherwise",
+                     default="frame-index.bin")
+options.add_argument("--frames", help="frame or first-last frames looked up by the query workflow")
+options.add_argument("--location", help="text the locations looked up by the query workflow "
+                     "contain, e.g. reel1 (default: every location)", default="")
+options.add_argument("--report", help="path of the xlsx report created by the XLS output",
+                     default="video-information.xlsx")
+options.add_argument("--report-row-limit", help="number of rows of a report sheet before the "
+                     "report continues on a new sheet or file", type=int, default=1000000)
+options.add_argument("--report-split", help="continue the report on a new sheet or a new file",
+                     choices=["sheet", "file"], default="sheet")
+options.add_argument("--report-image-budget", help="MB of thumbnails a report file keeps in "
+                     "memory until it is saved; past it the report continues in a new file",
+                     type=int, default=128)
+options.add_argument("--incremental", help="only store the files that changed since they were "
+                     "stored, replacing their rows", action="store_true")
+options.add_argument("--manifest", help="where the processed files are recorded for --incremental: "
+                     "DB for a collection of the database or the path of a json file", default="DB")
+options.add_argument("--batch-size", help="number of rows written to the database at once",
+                     type=int, default=1000)
+options.add_argument(
+    "--mmap", help="read the machine files through mmap", action="store_true")
+options.add_argument("--pipeline", help="serial: parse, store and query one step after the "
+                     "other; async: overlap the parsing with the database writes and run the "
+                     "report queries at once (DB output)", choices=["serial", "async"],
+                     default="serial")
+options.add_argument("--db-concurrency", help="database writes and report queries in flight "
+                     "at once with --pipeline async", type=int, default=4)
+options.add_argument("--watch", help="folder where the xytech and machine files are dropped; "
+                     "stores them as soon as they are completely written (DB output)")
+options.add_argument("--poll-interval", help="seconds between two scans of the watched folder",
+                     type=float, default=2.0)
+options.add_argument("--settle-seconds", help="seconds a dropped file must stay unchanged "
+                     "before it is stored", type=float, default=5.0)
+options.add_argument("--stats-file", help="json file where the watch-folder counters are written")
+options.add_argument("--profile", help="json file where the wall time, cpu time, items and peak "
+                     "memory of each stage of the run are written")
+options.add_argument("--profile-stats", help="with --profile, also profile the stages with cProfile "
+                     "and save the pstats of the slowest one next to the json file",
+                     action="store_true")
+
+# every workflow is a subcommand: python3 main.py <csv, db, xls, migrate or query> [options]
+parser = argparse.ArgumentParser()
+workflowParsers = parser.add_subparsers(dest="workflow", metavar="workflow", required=True)
+workflowParsers.add_parser("csv", parents=[options],
+                           help="write output_<date>.csv of the xytech and machine files")
+workflowParsers.add_parser("db", parents=[options],
+                           help="store the xytech and machine files in the database and "
+                           "print the reports")
+workflowParsers.add_parser("xls", parents=[options],
+                           help="write the xlsx report of the stored frames of the --process "
+                           "video with their thumbnails")
+workflowParsers.add_parser("migrate", parents=[options],
+                           help="bring the frames stored by older versions up to date")
+workflowParsers.add_parser("query", parents=[options],
+                           help="list the ranges of the --location that touch the --frames, "
+                           "with the user, machine and date of each one")
+
+# the --output <DB, CSV, XLS or MIGRATE> option of the earlier versions still
+# selects the workflow: it is moved to the front as the subcommand
+def workflowArguments(argv):
+    argv = list(argv)
+    for position, argument in enumerate(argv):
+        if argument == "--output" and position + 1 < len(argv):
+            workflow = argv[position + 1]
+            del argv[position:position + 2]
+            return [workflow.lower()] + argv
+        if argument.startswith("--output="):
+            del argv[position]
+            return [argument.split("=", 1)[1].lower()] + argv
+    return argv
+
+# parses the command line; args.output is the workflow in capitals as the
+# functions shared by several workflows expect it
+def parseArguments(argv):
+    parsedArgs = parser.parse_args(workflowArguments(argv))
+    parsedArgs.output = parsedArgs.workflow.upper()
+    return parsedArgs
+
+# the arguments of the running workflow; the functions imported by another
+# script (e.g. the benchmarks) run with the default arguments
+args = parseArguments(["csv"])
 
 # assuming the video is 60 frames per second
 frame_per_second = 60
 
-# connect to mongo db server
-myClient = pymongo.MongoClient("mongodb://localhost:27017/")
+# size of the thumbnails in the workbook
+thumbnail_size = "96x74"
+
+# the connection to the mongo db server, made by mongoClient the first time a
+# workflow uses the database
+myClient = None
+myClientLock = threading.Lock()
+
+# connects to the mongo db server on the first call and returns the client
+def mongoClient():
+    global myClient
+    with myClientLock:
+        if myClient is None:
+            import pymongo
+            myClient = pymongo.MongoClient("mongodb://localhost:27017/")
+    return myClient
+
+# closes the connection to the mongo db server if a workflow opened it
+def closeMongoClient():
+    global myClient
+    with myClientLock:
+        if myClient is not None:
+            myClient.close()
+            myClient = None
+
+# the stages measured with --profile by name: the times they were entered, the
+# items they handled, their wall and cpu time with and without the stages nested
+# in them and the peak resident memory reached while they ran
+profiledStages = {}
+profiledStagesLock = threading.Lock()
+
+# the peak memory records of the stages running on any thread by id: the peak resident
+# memory of the process (VmHWM) is reset when a stage starts, and the peak reached
+# until then is first added to the stages already running
+memoryPeaks = {}
+memoryPeaksLock = threading.Lock()
+
+# the peak resident memory of the process before the last reset, in bytes
+processMemoryPeakBeforeReset = 0
+
+# the /proc/self/status and /proc/self/clear_refs descriptors of this process,
+# opened once as the stages read and reset the peak memory many times; a forked
+# worker opens its own
+memoryFileDescriptors = {}
+
+def memoryFileDescriptor(name, flags):
+    key = (os.getpid(), name)
+    if key not in memoryFileDescriptors:
+        try:
+            memoryFileDescriptors[key] = os.open(f"/proc/self/{name}", flags)
+        except OSError:
+            memoryFileDescriptors[key] = None
+    return memoryFileDescriptors[key]
+
+# the peak resident memory of the process in bytes since it was last reset; uses
+# ru_maxrss (the peak of the whole run, in kilobytes on linux) without /proc
+def residentMemoryPeak():
+    statusDescriptor = memoryFileDescriptor("status", os.O_RDONLY)
+    if statusDescriptor is not None:
+        status = os.pread(statusDescriptor, 8192, 0)
+        position = status.find(b"VmHWM:")
+        if position >= 0:
+            return int(status[position + 6:status.index(b"kB", position)]) * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+# resets the peak resident memory of the process to its current size; does
+# nothing where /proc/self/clear_refs can not be written
+def resetResidentMemoryPeak():
+    clearDescriptor = memoryFileDescriptor("clear_refs", os.O_WRONLY)
+    if clearDescriptor is not None:
+        try:
+            os.pwrite(clearDescriptor, b"5", 0)
+        except OSError:
+            pass
+
+# the peak resident memory of the whole run in megabytes, even after the peak of
+# the process was reset by the stages
+def processMemoryPeakMB():
+    with memoryPeaksLock:
+        return max(processMemoryPeakBeforeReset, residentMemoryPeak()) / 2 ** 20
+
+# starts measuring the peak memory of a stage; returns its peak record
+def startMemoryPeak():
+    global processMemoryPeakBeforeReset
+    peak = {"bytes": 0}
+    with memoryPeaksLock:
+        currentPeak = residentMemoryPeak()
+        processMemoryPeakBeforeReset = max(processMemoryPeakBeforeReset, currentPeak)
+        for runningPeak in memoryPeaks.values():
+            runningPeak["bytes"] = max(runningPeak["bytes"], currentPeak)
+        resetResidentMemoryPeak()
+        memoryPeaks[id(peak)] = peak
+    return peak
+
+# stops measuring the peak memory of a stage; returns the peak in bytes
+def stopMemoryPeak(peak):
+    with memoryPeaksLock:
+        del memoryPeaks[id(peak)]
+        return max(peak["bytes"], residentMemoryPeak())
+
+# adds the peak memory of a run of the stage to its totals
+def recordMemoryPeak(name, peakBytes):
+    with profiledStagesLock:
+        totals = profiledStages[name]
+        totals["peakRssMB"] = max(totals["peakRssMB"], peakBytes / 2 ** 20)
+
+# the cProfile profiler of each stage with --profile-stats
+stageProfilers = {}
+
+# the stages running on each thread, the innermost last
+runningStages = threading.local()
+
+# measures the stage run in the with block; the items handled by the stage can be
+# added to the "items" of the dictionary it yields. The cpu time is the time of
+# the thread. Only the stages not nested in another one of the main thread are
+# profiled with cProfile, as a single profiler can run at a time. The peak memory
+# of the streamed stages is measured once over the whole stream (measureMemory is
+# False for each of their items)
+@contextlib.contextmanager
+def profileStage(name, items=0, measureMemory=True):
+    if not args.profile:
+        yield {"items": items}
+        return
+    stack = runningStages.__dict__.setdefault("stack", [])
+    stage = {"items": items, "childWallSeconds": 0, "childCpuSeconds": 0}
+    profiler = None
+    if (args.profile_stats and not stack
+            and threading.current_thread() is threading.main_thread()):
+        import cProfile
+        profiler = stageProfilers.setdefault(name, cProfile.Profile())
+    stack.append(stage)
+    memoryPeak = startMemoryPeak() if measureMemory else None
+    startWall = time.perf_counter()
+    startCpu = time.thread_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield stage
+    finally:
+        if profiler:
+            profiler.disable()
+        wallSeconds = time.perf_counter() - startWall
+        cpuSeconds = time.thread_time() - startCpu
+        stack.pop()
+        if stack:
+            stack[-1]["childWallSeconds"] += wallSeconds
+            stack[-1]["childCpuSeconds"] += cpuSeconds
+        with profiledStagesLock:
+            totals = profiledStages.setdefault(name, {
+                "calls": 0, "items": 0, "wallSeconds": 0, "selfWallSeconds": 0,
+                "cpuSeconds": 0, "selfCpuSeconds": 0, "peakRssMB": 0})
+            totals["calls"] += 1
+            totals["items"] += stage["items"]
+            totals["wallSeconds"] += wallSeconds
+            totals["selfWallSeconds"] += wallSeconds - stage["childWallSeconds"]
+            totals["cpuSeconds"] += cpuSeconds
+            totals["selfCpuSeconds"] += cpuSeconds - stage["childCpuSeconds"]
+        if memoryPeak:
+            recordMemoryPeak(name, stopMemoryPeak(memoryPeak))
+
+# measures a stage that streams its items, e.g. a generator consumed by the next
+# stage: every item taken from the iterable counts to the stage
+def profileIterator(name, iterable):
+    if not args.profile:
+        return iterable
+    return profiledItems(name, iter(iterable))
+
+def profiledItems(name, iterator):
+    memoryPeak = startMemoryPeak()
+    try:
+        while True:
+            with profileStage(name, 1, measureMemory=False) as stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    stage["items"] = 0
+                    return
+            yield item
+    finally:
+        peakBytes = stopMemoryPeak(memoryPeak)
+        if name in profiledStages:
+            recordMemoryPeak(name, peakBytes)
+
+# writes the measured stages to the json file of --profile; with --profile-stats
+# the cProfile stats of the slowest profiled stage are saved as <file>.pstats
+def writeProfile(path, startTime):
+    report = {
+        "command": sys.argv,
+        "wallSeconds": time.perf_counter() - startTime,
+        "cpuSeconds": time.process_time(),
+        "peakRssMB": processMemoryPeakMB(),
+        "stages": profiledStages,
+        "slowestStage": max(profiledStages, default=None,
+                            key=lambda name: profiledStages[name]["selfWallSeconds"]),
+    }
+    if stageProfilers:
+        import pstats
+        profiledStage = max(stageProfilers,
+                            key=lambda name: profiledStages[name]["wallSeconds"])
+        statsPath = os.path.splitext(path)[0] + ".pstats"
+        pstats.Stats(stageProfilers[profiledStage]).dump_stats(statsPath)
+        report["pstats"] = {"stage": profiledStage, "path": statsPath}
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
 
 # check if the file exists and if the file is the correct file type
 def checkFile(files):
@@ -49,79 +400,125 @@ def readFile(file):
             print(f"{file} not found or missing")
         return
 
-    with open(file, 'r') as f:
+    with profileStage("read"), open(file, 'r') as f:
         return f.read()
 
+# yields the lines of the file one at a time without the line endings so the
+# parsers never hold the whole file in memory; with useMmap the file is mapped
+# instead of read through the buffered file handle
+def readFileLines(file, useMmap=False):
+    if (file is None or file == "" or not os.path.exists(file)):
+        if (args.verbose):
+            print(f"{file} not found or missing")
+        return
+
+    with open(file, 'rb' if useMmap else 'r') as f:
+        if not useMmap:
+            for line in f:
+                yield line.rstrip("\r\n")
+            return
+        # an empty file can not be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mappedFile:
+            for line in iter(mappedFile.readline, b""):
+                yield line.decode("utf-8").rstrip("\r\n")
+
+# the parsers accept either the whole string or any iterable of lines
+# (an open file handle or readFileLines)
+def linesOf(string):
+    if isinstance(string, str):
+        return string.splitlines()
+    return (line.rstrip("\r\n") for line in string)
+
 
 def stringIsNumberNotEmptyAndNotSpace(string):
     return (string.isnumeric() and string != "" and not string.isspace())
 
-# split the string by : and returns a dictionary of
-# the item that is before the : as the key and the item after the : as the valu
-def parseXytechInfo(string):
-    if not string:
-        raise ValueError("No string passed")
-    parsedInfo = {}
+# split each line by : and yields (key, value) records where the value is the
+# item after the : or a list with the items listed under a key with no value
+def iterXytechRecords(lines):
+    seenKeys = set()
     currentKey = ""
 
-    for line in string.splitlines():
+    for line in linesOf(lines):
         line = line.split(":")
 
         # if there is no : in the line, and the current key is not in the parsedInfo, then continue
-        if (len(line) == 1 and currentKey not in parsedInfo):
+        if (len(line) == 1 and currentKey not in seenKeys):
             continue
 
         # if there is a : and the value is empty, then create an empty list
-        if ((len(line) > 1) and not line[1] and line[0] not in parsedInfo):
+        if ((len(line) > 1) and not line[1] and line[0] not in seenKeys):
             currentKey = line[0].strip()
-            parsedInfo[line[0].strip()] = []
+            seenKeys.add(currentKey)
+            yield currentKey, []
         # if there is a : and the value is not empty, then create a key and
         # add the value to the parsedInfo
         # and set the current key to empty
         elif len(line) > 1 and line[1] and not currentKey:
             currentKey = ""
-            parsedInfo[line[0].strip()] = line[1].strip()
+            seenKeys.add(line[0].strip())
+            yield line[0].strip(), line[1].strip()
         # if there is a : and the value is not empty, and the current key is not empty,
         # then add the value to the list
-        elif currentKey in parsedInfo and not line[0].isspace() and line[0]:
-            parsedInfo[currentKey].append(line[0].strip())
-    return parsedInfo
+        elif currentKey in seenKeys and not line[0].isspace() and line[0]:
+            yield currentKey, [line[0].strip()]
 
-# splits the string by space and returns a dictionary of the
-# first index as the key and the rest of the indexes as the value
-def parseBaselightInfo(string):
+# returns a dictionary of the item that is before the : as the key and the item
+# after the : as the value
+def parseXytechInfo(string):
     if not string:
-        if args.verbose:
-            print("The string is empty")
-        return
+        raise ValueError("No string passed")
+    parsedInfo = {}
 
+    for key, value in iterXytechRecords(string):
+        if isinstance(value, list):
+            parsedInfo.setdefault(key, []).extend(value)
+        else:
+            parsedInfo[key] = value
+    return parsedInfo
+
+# collects the (path, frames) records of a machine file into a dictionary of
+# the path as the key and all of its frames as the value; the frames are kept
+# in typed arrays instead of lists of python ints
+def groupRecordsByPath(records):
     parsedInfo = {}
+    for key, frames in records:
+        if key not in parsedInfo:
+            parsedInfo[key] = array.array('I')
+        parsedInfo[key].extend(frames)
+    return parsedInfo
 
-    for line in string.splitlines():
+# splits each line by space and yields a (path, frames) record of the
+# first index as the path and the rest of the indexes as the frames
+def iterBaselightRecords(lines):
+    for line in linesOf(lines):
         line = line.split(" ")
 
-        if not line:
-            continue
-
         key = "/".join(line[0].split("/")[2:])
 
-        if key and key not in parsedInfo:
-            parsedInfo[key] = []
+        if not key:
+            continue
 
-        for i in range(1, len(line)):
-            if stringIsNumberNotEmptyAndNotSpace(line[i]):
-                parsedInfo[key].append(int(line[i]))
-    return parsedInfo
+        yield key, array.array('I', [int(value) for value in line[1:]
+                                     if stringIsNumberNotEmptyAndNotSpace(value)])
 
 
-def parseFlameInfo(string):
+def parseBaselightInfo(string):
     if not string:
         if args.verbose:
-            print("No string passed")
+            print("The string is empty")
         return
-    parsedInfo = {}
+
+    return groupRecordsByPath(iterBaselightRecords(string))
+
+
+def iterFlameRecords(lines):
     # for each line,
-    for line in string.splitlines():
+    for line in linesOf(lines):
+        if not line:
+            continue
 
         # get the first path and then the second path
         firstPath, secondPath = line.split(" ", 1)
@@ -129,28 +526,34 @@ def parseFlameInfo(string):
         # split the second path by space
         secondPath = secondPath.split(" ")
 
-        if not line:
-            continue
-
         # joining the first path with the second one
         key = "/".join((firstPath + " " + secondPath[0]).split("/")[1:])
 
-        if key and key not in parsedInfo:
-            parsedInfo[key] = []
+        if not key:
+            continue
+
+        yield key, array.array('I', [int(value) for value in secondPath[1:]
+                                     if stringIsNumberNotEmptyAndNotSpace(value)])
 
-        for i in range(1, len(secondPath)):
-            if stringIsNumberNotEmptyAndNotSpace(secondPath[i]):
-                parsedInfo[key].append(int(secondPath[i]))
-    return parsedInfo
 
-# gets the frame and shows the consecutive numbers as ranges
-def framesAsRanges(frameList, range):
-    if (frameList == None or len(frameList) == 0):
+def parseFlameInfo(string):
+    if not string:
+        if args.verbose:
+            print("No string passed")
+        return
+
+    return groupRecordsByPath(iterFlameRecords(string))
+
+# the interpreted version of framesAsRanges, kept as the reference the
+# vectorized version has to match
+def framesAsRangesReference(frameList, range):
+    frameIterator = iter(frameList if frameList is not None else ())
+    prevValue = currentRange = next(frameIterator, None)
+    if (currentRange is None):
         print("No frameList passed")
         return frameList
     frames = []
-    prevValue = currentRange = frameList[0]
-    for frame in frameList[1:]:
+    for frame in frameIterator:
         if frame == prevValue + range:
             prevValue = frame
         else:
@@ -161,50 +564,159 @@ def framesAsRanges(frameList, range):
                   prevValue else str(currentRange))
     return frames
 
+# finds where the consecutive frames (frames that are range apart) start and end
+# and returns the start and end frame of every run as two arrays; uses numpy to
+# find the boundaries of long frame lists with diff/nonzero when it is installed
+def framesAsRunBoundaries(frameList, range):
+    if len(frameList) >= numpyMinimumFrames and loadNumpy() is not None:
+        if isinstance(frameList, (array.array, memoryview)):
+            # zero copy view of the typed array or of the parse cache
+            frames = numpy.frombuffer(frameList, dtype=numpy.uint32)
+        else:
+            frames = numpy.fromiter(frameList, dtype=numpy.uint32)
+        if len(frames) == 0:
+            return frames, frames
+        # the differences are signed so frames going backwards also break a run
+        breaks = numpy.nonzero(
+            numpy.diff(frames.astype(numpy.int64)) != range)[0]
+        starts = numpy.concatenate((frames[:1], frames[breaks + 1]))
+        ends = numpy.concatenate((frames[breaks], frames[-1:]))
+        return starts, ends
+
+    starts, ends = array.array('I'), array.array('I')
+    frameIterator = iter(frameList)
+    prevValue = currentRange = next(frameIterator, None)
+    if currentRange is None:
+        return starts, ends
+    for frame in frameIterator:
+        if frame != prevValue + range:
+            starts.append(currentRange)
+            ends.append(prevValue)
+            currentRange = frame
+        prevValue = frame
+    starts.append(currentRange)
+    ends.append(prevValue)
+    return starts, ends
+
+# formats the start and end arrays as the "start-end" ranges (or only the frame
+# when the range has one frame)
+def formatRanges(starts, ends):
+    return [f"{start}-{end}" if start != end else str(start)
+            for start, end in zip(starts.tolist(), ends.tolist())]
+
+# gets the frame and shows the consecutive numbers as ranges
+def framesAsRanges(frameList, range):
+    if frameList is None or len(frameList) == 0:
+        print("No frameList passed")
+        return frameList
+    return formatRanges(*framesAsRunBoundaries(frameList, range))
+
+# builds an index of the xytech locations keyed on the path after the second /
+# (the part shared with the machine files) so every machine entry is matched
+# with one lookup; each key holds the position and first path of the locations
+def buildLocationIndex(xytech):
+    locationIndex = {}
+    for position, location in enumerate(xytech['Location']):
+        splitLocation = location.split("/")
+        pathToMatch = "/".join(splitLocation[3:])
+        locationIndex.setdefault(pathToMatch, []).append(
+            (position, splitLocation[1]))
+    return locationIndex
+
+# looks up each (path, prefix, frames) entry of a machine file in the location
+# index and returns the matches in the order of the xytech locations; entries can
+# be streamed straight from the parsers, the frames of an entry seen again are
+# joined after the frames of the first one into a new array, so the arrays of the
+# parser (shared by every location with the same path) are never changed
+def matchEntriesToLocations(locationIndex, entries):
+    matchesPerLocation = {}
+    for pathToMatch, prefix, frames in entries:
+        for position, firstPath in locationIndex.get(pathToMatch, ()):
+            locationMatches = matchesPerLocation.setdefault(position, {})
+            if (prefix, pathToMatch) in locationMatches:
+                locationMatches[(prefix, pathToMatch)][3].append(frames)
+            else:
+                locationMatches[(prefix, pathToMatch)] = (
+                    prefix, firstPath, pathToMatch, [frames])
+    matches = []
+    for position in sorted(matchesPerLocation):
+        for prefix, firstPath, pathToMatch, pieces in matchesPerLocation[position].values():
+            frames = pieces[0]
+            if len(pieces) > 1:
+                frames = array.array('I')
+                for piece in pieces:
+                    frames.extend(piece)
+            matches.append((prefix, firstPath, pathToMatch, frames))
+    return matches
+
+# the machine file can be the parsed dictionary or the (path, frames) records
+# yielded by the parsers
+def machineFileRecords(otherFile):
+    if isinstance(otherFile, dict):
+        return otherFile.items()
+    return otherFile
+
+# formats a range as "start-end", or only the frame when the range has one frame
+def formatFrameRange(start, end):
+    return f"{start}-{end}" if start != end else str(start)
+
+# yields a (location, start, end) record for each run of consecutive frames
+def frameRangeRecords(location, frameList):
+    if len(frameList) == 0:
+        print("No frameList passed")
+        return
+    with profileStage("range collapsing", len(frameList)):
+        starts, ends = framesAsRunBoundaries(frameList, 1)
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield location, start, end
+
 # merges the two files by using the path of the xytech file and the baselight file;
 # will remove the first / from xytech and replace it by the first / of baselight
 # merge will be done by using the path of xytech after removng the first and second /
-def mergeFilesForXytechAndBaselightByPath(xytech, otherFile):
-    locations = xytech['Location']
-    stringBuilder = ""
-    for location in locations:
-        firstPath = location.split("/")[1]
-        # from second / to the end of the string
-        pathToMatch = "/".join(location.split("/")[3:])
-        if pathToMatch in otherFile:
-            frames = framesAsRanges(otherFile[pathToMatch], 1)
-            for frame in frames:
-                # should separate by comma
-                stringBuilder += firstPath + "/" + \
-                    "/".join(pathToMatch.split("/")) + "," + frame + "\n"
-    return stringBuilder
+# yields a (location, start, end) record for each range of frames
+def mergeFilesForXytechAndBaselightByPath(xytech, otherFile, locationIndex=None):
+    if locationIndex is None:
+        locationIndex = buildLocationIndex(xytech)
+    entries = ((key, "", item) for key, item in machineFileRecords(otherFile))
+    for _, firstPath, pathToMatch, item in matchEntriesToLocations(locationIndex, entries):
+        yield from frameRangeRecords(firstPath + "/" + pathToMatch, item)
 
 
 def mergeFilesForXytechAndFlameByPath(
-        xytech, otherFile):
-    locations = xytech['Location']
-    stringBuilder = ""
-    for location in locations:
-        firstPath = location.split("/")[1]
-        # from second / to the end of the string
-        pathToMatch = "/".join(location.split("/")[3:])
-        for key, item in otherFile.items():
-            sec, filePath = key.split(" ")
-            if pathToMatch == filePath:
-                frames = framesAsRanges(item, 1)
-                for frame in frames:
-                    # should separate by comma and add the secondary path
-                    stringBuilder += sec + " " + firstPath + "/" + \
-                        "/".join(pathToMatch.split("/")) + "," + frame + "\n"
-    return stringBuilder
+        xytech, otherFile, locationIndex=None):
+    if locationIndex is None:
+        locationIndex = buildLocationIndex(xytech)
+    # split each key once into the secondary path and the path to match
+    entries = []
+    for key, item in machineFileRecords(otherFile):
+        sec, filePath = key.split(" ")
+        entries.append((filePath, sec, item))
+    for sec, firstPath, pathToMatch, item in matchEntriesToLocations(locationIndex, entries):
+        # the location keeps the secondary path
+        yield from frameRangeRecords(sec + " " + firstPath + "/" + pathToMatch, item)
+
+# merges every machine file against the same location index and returns the
+# (location, start, end) records per file name
+def mergeMachineFilesByPath(xytech, files, locationIndex=None):
+    if locationIndex is None:
+        locationIndex = buildLocationIndex(xytech)
+    mergedFiles = {}
+    for key, file in files.items():
+        machine = key.split("_")[0]
+        if (machine == "Flame"):
+            mergedFiles[key] = mergeFilesForXytechAndFlameByPath(
+                xytech, file, locationIndex)
+        elif (machine == "Baselight"):
+            mergedFiles[key] = mergeFilesForXytechAndBaselightByPath(
+                xytech, file, locationIndex)
+        else:
+            if (args.verbose):
+                print("Machine not supported")
+    return mergedFiles
 
 # creates a new row for each note in the xytech file
 def createNewRowsPerNote(xytech, keys):
-    stringBuilder = ""
-    columns = ""
-    for key in keys:
-        if not isinstance(xytech[key], list):
-            columns += xytech[key] + ","
+    columns = [xytech[key] for key in keys if not isinstance(xytech[key], list)]
 
     # for each key in the keys list
     for key in keys:
@@ -213,11 +725,12 @@ def createNewRowsPerNote(xytech, keys):
             # for each value in the list
             for value in xytech[key]:
                 # create a new row
-                stringBuilder += columns + value + "\n"
-    return stringBuilder
+                yield columns + [value]
 
-# creates the csv file
-def createCSVFile(xytech, files):
+# creates the csv file; the rows are written one at a time with the csv module.
+# With consolidate the ranges of all the files are unioned per location and
+# written in one block, each row with the users of the range
+def createCSVFile(xytech, files, consolidate=False):
     if (xytech == None or files == None):
         print("No data passed")
         sys.exit(2)
@@ -225,36 +738,268 @@ def createCSVFile(xytech, files):
     # store xytech keys except location
     xytechKeys = [key for key in xytech.keys() if key != "Location"]
 
-    locationsAndFrames = ""
+    # the file is named after the date of the last machine file
     dateOfFiles = ""
-    # for each file in the files dictionary
-    for key, file in files.items():
-        machine = key.split("_")[0]
+    for key in files:
         dateOfFiles = key.split("_")[2].split(".")[0]
-        currentFile = ""
-        if (machine == "Flame"):
-            currentFile = mergeFilesForXytechAndFlameByPath(
-                xytech, file)
-        elif (machine == "Baselight"):
-            currentFile = mergeFilesForXytechAndBaselightByPath(
-                xytech, file)
-        else:
-            if (args.verbose):
-                print("Machine not supported")
-        # sort the locations and frames by the frame number to fix formatting
-        currentFile = sorted(currentFile.splitlines(
-        ), key=lambda x: int(x.split(",")[1].split("-")[0]))
-        locationsAndFrames = locationsAndFrames + "\n" + "\n".join(currentFile)
 
-    with open("output_" + dateOfFiles + ".csv", "w") as f:
+    mergedFiles = mergeMachineFilesByPath(xytech, files)
+    with profileStage("csv write") as stage, \
+            open("output_" + dateOfFiles + ".csv", "w", newline="") as f:
+        # the line breaks are written separately to keep the layout of the file:
+        # a blank line after the notes and before the rows of each machine file,
+        # and no line break after the last row
+        csvWriter = csv.writer(f, lineterminator="")
         # write row 2 of the csv file the values of the xytech dictionary
-        f.write(createNewRowsPerNote(xytech, xytechKeys) + "\n")
-        # write row 4 of the csv file the keys of the baselight dictionary
-        f.write(locationsAndFrames)
+        for row in createNewRowsPerNote(xytech, xytechKeys):
+            csvWriter.writerow(row)
+            f.write("\n")
+        f.write("\n")
+
+        if consolidate:
+            records = sorted(consolidateRanges(mergedFiles.items()),
+                             key=operator.itemgetter(1))
+            stage["items"] += len(records)
+            # the users column of each set of files of the ranges
+            users = {}
+            f.write("\n")
+            for i, (location, start, end, sourceFiles) in enumerate(records):
+                if i:
+                    f.write("\n")
+                if sourceFiles not in users:
+                    users[sourceFiles] = " ".join(dict.fromkeys(
+                        sourceFile.split("_")[1] for sourceFile in sourceFiles))
+                csvWriter.writerow(
+                    (location, formatFrameRange(start, end), users[sourceFiles]))
+            return
 
-
-def printWorkDoneByUser(collection, user):
-    for workDoneByUser in collection.find({"userOnFile": user}):
+        # write row 4 of the csv file the keys of the baselight dictionary
+        for key in files:
+            # sort the locations and frames by the frame number to fix formatting
+            records = sorted(profileIterator("merge", mergedFiles.get(key, ())),
+                             key=operator.itemgetter(1))
+            stage["items"] += len(records)
+            f.write("\n")
+            for i, (location, start, end) in enumerate(records):
+                if i:
+                    f.write("\n")
+                csvWriter.writerow((location, formatFrameRange(start, end)))
+
+# written in the header of the binary files (parse cache and frame index) in the
+# byte order of the machine; a file written on a machine of the other byte order
+# reads it differently and is not used
+binaryByteOrderMark = 0x01020304
+
+# the strings as one utf-8 table padded to 4 bytes and the uint32 offsets of the
+# strings in the table, one more than the strings
+def packStrings(strings):
+    encodedStrings = [string.encode("utf-8") for string in strings]
+    offsets = array.array('I', [0])
+    for encodedString in encodedStrings:
+        offsets.append(offsets[-1] + len(encodedString))
+    table = b"".join(encodedStrings)
+    return offsets, table + b"\0" * (-len(table) % 4)
+
+# the string number of a table packed by packStrings
+def unpackString(table, offsets, number):
+    return str(table[offsets[number]:offsets[number + 1]], "utf-8")
+
+# maps the file read only; returns None when it is missing or empty
+def mapFile(path):
+    try:
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+# layout of the frame index files, in the byte order of the machine: the header
+# (magic, format version, byte order mark, number of locations, number of source
+# files, number of ranges, size of the string table), the offsets of the ranges
+# of each location (uint64, one more than the locations), the offsets of the
+# locations then of the source files in the string table (uint32), the utf-8
+# string table padded to 4 bytes, then the start, end, running maximum end and
+# source file of every range (uint32 each)
+frameIndexMagic = b"SWAINDEX"
+frameIndexHeader = struct.Struct("=8sIIIIQQ")
+frameIndexVersion = 1
+
+# groups (location, start, end, source) records into the ranges of each location
+# sorted by their start frame, kept in four arrays: start, end, the largest end of
+# the ranges up to it (which never decreases, so the ranges ending before a frame
+# are skipped with one bisect) and the number of the source. The sources are
+# numbered in the order they are first seen. Returns {"locations": {location:
+# arrays}, "sources": [sources]}
+def indexLocationRanges(records):
+    sources = []
+    sourceNumbers = {}
+    rangesPerLocation = {}
+    for location, start, end, source in records:
+        sourceNumber = sourceNumbers.get(source)
+        if sourceNumber is None:
+            sourceNumber = sourceNumbers[source] = len(sources)
+            sources.append(source)
+        locationRanges = rangesPerLocation.get(location)
+        if locationRanges is None:
+            locationRanges = rangesPerLocation[location] = array.array('I')
+        locationRanges.extend((start, end, sourceNumber))
+
+    locations = {}
+    with profileStage("frame index build", sum(
+            len(ranges) for ranges in rangesPerLocation.values()) // 3):
+        for location, ranges in rangesPerLocation.items():
+            locations[location] = sortedLocationRanges(ranges)
+    return {"locations": locations, "sources": sources}
+
+# builds the frame index of the merged records of machine files, given as
+# (file name, (location, start, end) records) like the items of
+# mergeMachineFilesByPath; the sources of the ranges are the file names
+def buildFrameIndex(mergedFiles):
+    return indexLocationRanges(
+        (location, start, end, key) for key, records in mergedFiles
+        for location, start, end in profileIterator("merge", records))
+
+# unions the ranges of every xytech location across the merged files (given like
+# for buildFrameIndex) with a sort-merge: the ranges of a location are sorted by
+# their start frame and a range starting at most one frame after the largest end
+# of the ranges before it starts a new consolidated range. The flame ranges are
+# unioned on the xytech location without their archive path, so the baselight
+# and flame work on a location is merged; a consolidated range keeps the archive
+# path only when all its ranges have the same one. Yields (location, start, end,
+# source files) with the files the range comes from in their order, the same
+# tuple for the same files; only ranges are held, never frames
+def consolidateRanges(mergedFiles):
+    # the source of each range is its file and its location as merged
+    frameIndex = indexLocationRanges(
+        (location.split(" ")[-1], start, end, (key, location))
+        for key, records in mergedFiles
+        for location, start, end in profileIterator("merge", records))
+    sources = frameIndex["sources"]
+    groups = {}
+    for location, (starts, ends, maxEnds, sourceNumbers) in frameIndex["locations"].items():
+        with profileStage("consolidation", len(starts)):
+            consolidated = []
+            groupStart = 0
+            for i in range(1, len(starts) + 1):
+                if i < len(starts) and starts[i] <= maxEnds[i - 1] + 1:
+                    continue
+                group = tuple(sorted(set(sourceNumbers[groupStart:i])))
+                if group not in groups:
+                    mergedLocations = {sources[number][1] for number in group}
+                    groups[group] = (
+                        mergedLocations.pop() if len(mergedLocations) == 1 else None,
+                        tuple(dict.fromkeys(sources[number][0] for number in group)))
+                mergedLocation, sourceFiles = groups[group]
+                consolidated.append((mergedLocation or location, starts[groupStart],
+                                     maxEnds[i - 1], sourceFiles))
+                groupStart = i
+        yield from consolidated
+
+# sorts the (start, end, source number) ranges of a location, given one after the
+# other in a single array, by start, end and source number and returns the start,
+# end, running maximum end and source number arrays of the frame index; long
+# locations are sorted with numpy when it is installed
+def sortedLocationRanges(ranges):
+    if len(ranges) >= 3 * numpyMinimumFrames and loadNumpy() is not None:
+        columns = numpy.frombuffer(ranges, dtype=numpy.uint32).reshape(-1, 3)
+        columns = columns[numpy.lexsort((columns[:, 2], columns[:, 1], columns[:, 0]))]
+        sortedColumns = []
+        for column in (columns[:, 0], columns[:, 1],
+                       numpy.maximum.accumulate(columns[:, 1]), columns[:, 2]):
+            sortedColumns.append(array.array('I'))
+            sortedColumns[-1].frombytes(numpy.ascontiguousarray(column).tobytes())
+        return tuple(sortedColumns)
+
+    starts, ends, sourceNumbers = zip(*sorted(zip(ranges[0::3], ranges[1::3], ranges[2::3])))
+    return (array.array('I', starts), array.array('I', ends),
+            array.array('I', itertools.accumulate(ends, max)), array.array('I', sourceNumbers))
+
+# yields the (start, end, source number) ranges of one location of the frame
+# index overlapping firstFrame-lastFrame, in the order of their start frame
+def overlappingRanges(locationRanges, firstFrame, lastFrame):
+    starts, ends, maxEnds, sourceNumbers = locationRanges
+    # the ranges before the first one whose running maximum end reaches
+    # firstFrame all end before it, the ranges from lastRange on start after lastFrame
+    firstRange = bisect.bisect_left(maxEnds, firstFrame)
+    lastRange = bisect.bisect_right(starts, lastFrame)
+    for i in range(firstRange, lastRange):
+        if ends[i] >= firstFrame:
+            yield starts[i], ends[i], sourceNumbers[i]
+
+# yields the (location, start, end, source file) ranges of the frame index
+# overlapping firstFrame-lastFrame (a single frame when they are the same) in the
+# locations containing locationText
+def queryFrameIndex(frameIndex, firstFrame, lastFrame, locationText=""):
+    sources = frameIndex["sources"]
+    for location, locationRanges in frameIndex["locations"].items():
+        if locationText in location:
+            for start, end, sourceNumber in overlappingRanges(
+                    locationRanges, firstFrame, lastFrame):
+                yield location, start, end, sources[sourceNumber]
+
+# writes the frame index to path through a temporary file renamed into place
+def saveFrameIndex(path, frameIndex):
+    locations = frameIndex["locations"]
+    rangeOffsets = array.array('Q', [0])
+    for starts, _, _, _ in locations.values():
+        rangeOffsets.append(rangeOffsets[-1] + len(starts))
+    stringOffsets, stringTable = packStrings(list(locations) + frameIndex["sources"])
+
+    temporaryPath = f"{path}.{os.getpid()}.tmp"
+    with open(temporaryPath, "wb") as f:
+        f.write(frameIndexHeader.pack(
+            frameIndexMagic, frameIndexVersion, binaryByteOrderMark, len(locations),
+            len(frameIndex["sources"]), rangeOffsets[-1], len(stringTable)))
+        f.write(rangeOffsets)
+        f.write(stringOffsets)
+        f.write(stringTable)
+        for column in range(4):
+            for locationRanges in locations.values():
+                f.write(locationRanges[column])
+    os.replace(temporaryPath, path)
+
+# maps a frame index saved by saveFrameIndex; the arrays of each location are
+# uint32 views of the mapped file. Returns None when the file is missing, of
+# another format version or byte order, or truncated
+def loadFrameIndex(path):
+    mappedFile = mapFile(path)
+    if mappedFile is None or len(mappedFile) < frameIndexHeader.size:
+        return None
+    magic, version, byteOrderMark, locationCount, sourceCount, rangeCount, stringBytes = \
+        frameIndexHeader.unpack_from(mappedFile)
+    rangeOffsetsStart = frameIndexHeader.size
+    stringOffsetsStart = rangeOffsetsStart + 8 * (locationCount + 1)
+    stringTableStart = stringOffsetsStart + 4 * (locationCount + sourceCount + 1)
+    columnsStart = stringTableStart + stringBytes
+    if (magic != frameIndexMagic or version != frameIndexVersion
+            or byteOrderMark != binaryByteOrderMark
+            or len(mappedFile) != columnsStart + 16 * rangeCount):
+        return None
+
+    view = memoryview(mappedFile)
+    rangeOffsets = view[rangeOffsetsStart:stringOffsetsStart].cast('Q')
+    stringOffsets = view[stringOffsetsStart:stringTableStart].cast('I')
+    stringTable = view[stringTableStart:columnsStart]
+    columns = [view[columnsStart + 4 * rangeCount * column:
+                    columnsStart + 4 * rangeCount * (column + 1)].cast('I')
+               for column in range(4)]
+    locations = {}
+    for locationNumber in range(locationCount):
+        firstRange, lastRange = rangeOffsets[locationNumber], rangeOffsets[locationNumber + 1]
+        locations[unpackString(stringTable, stringOffsets, locationNumber)] = tuple(
+            column[firstRange:lastRange] for column in columns)
+    sources = [unpackString(stringTable, stringOffsets, locationCount + sourceNumber)
+               for sourceNumber in range(sourceCount)]
+    return {"locations": locations, "sources": sources}
+
+
+def findWorkDoneByUser(collection, user):
+    return collection.find({"userOnFile": user})
+
+
+def printWorkDoneByUser(collection, user, documents=None):
+    if documents is None:
+        documents = findWorkDoneByUser(collection, user)
+    for workDoneByUser in documents:
         userOnFile = workDoneByUser["userOnFile"]
         dateOfFile = workDoneByUser["dateOfFile"]
         prettyDate = datetime.datetime.fromisoformat(
@@ -267,35 +1012,16 @@ def printWorkDoneByUser(collection, user):
         print("frame_range: ", frame_range, "\n")
 
 
-def printWorkDoneBeforeDateAndMachine(collection, date, machine):
-    workDoneBeforeDateAndMachine = collection.aggregate([
-        {
-            "$lookup": {
-                "from": "employee",
-                "localField": "userOnFile",
-                "foreignField": "userOnFile",
-                "as": "emp"
-            }
-
-        },
-        {
-            "$match": {
-                "dateOfFile": {"$lt": date.isoformat()},
-                "emp.machine": machine
-            }
-        },
-        {
-            "$project": {
-                "userOnFile": "$userOnFile",
-                "location": "$location",
-                "frame_range": "$frame_range",
-                "dateOfFile": "$dateOfFile",
-                "machine": "$emp.machine"
-            }
-        }
-    ]
-    )
-    for document in workDoneBeforeDateAndMachine:
+# the machine is stored on each frame document, so the frames are found with the
+# machine and date index instead of joining the employee collection
+def findWorkDoneBeforeDateAndMachine(collection, date, machine):
+    return collection.find({"machine": machine, "dateOfFile": {"$lt": date.isoformat()}})
+
+
+def printWorkDoneBeforeDateAndMachine(collection, date, machine, documents=None):
+    if documents is None:
+        documents = findWorkDoneBeforeDateAndMachine(collection, date, machine)
+    for document in documents:
         userOnFile = document["userOnFile"]
         dateOfFile = document["dateOfFile"]
         frameRange = document["frame_range"]
@@ -311,10 +1037,16 @@ def printWorkDoneBeforeDateAndMachine(collection, date, machine):
         print("frame/range:", frameRange, "\n")
 
 
-def printWorkDoneOnAndDate(collection, personComputer, date):
-    workDoneInScriptRunnerOnDate = collection.find(
-        {"location": {"$regex": ".*" + personComputer + ".*"}, "dateOfFile": date.isoformat()})
-    for document in workDoneInScriptRunnerOnDate:
+# the host is stored on each frame document, so the frames are found with the host
+# and date index instead of scanning every location with a regex
+def findWorkDoneOnAndDate(collection, personComputer, date):
+    return collection.find({"host": personComputer, "dateOfFile": date.isoformat()})
+
+
+def printWorkDoneOnAndDate(collection, personComputer, date, documents=None):
+    if documents is None:
+        documents = findWorkDoneOnAndDate(collection, personComputer, date)
+    for document in documents:
         dateOfFile = document["dateOfFile"]
         frameRange = document["frame_range"]
         location = document["location"]
@@ -328,15 +1060,142 @@ def printWorkDoneOnAndDate(collection, personComputer, date):
         print("frame range:", frameRange, "\n")
 
 
-def printAllUsersByMachineType(collection, machine):
-    for getOnlyNameByMachineType in collection.distinct("userOnFile",
-                                                        {"machine": machine}):
+def findAllUsersByMachineType(collection, machine):
+    return collection.distinct("userOnFile", {"machine": machine})
+
+
+def printAllUsersByMachineType(collection, machine, documents=None):
+    if documents is None:
+        documents = findAllUsersByMachineType(collection, machine)
+    for getOnlyNameByMachineType in documents:
         print(getOnlyNameByMachineType, "\n")
 
 
-def storeInMongoDB(xytech, files):
+# the reports printed after the files are stored, in their order: the title, the
+# print function, the query function and the arguments of both
+def databaseReports(videoFiles):
+    # gets the work summary collection from the database, the users of a machine
+    # are read from the machine index of the rollup
+    summaryCollection = videoFiles["workSummary"]
+
+    # gets the frame collection from the database
+    frameCollection = videoFiles["frame"]
+
+    return [
+        ("1). Work done by TDanza\n", printWorkDoneByUser, findWorkDoneByUser,
+         (frameCollection, "TDanza")),
+        ("2). Work done before 3-25-2023 date on a flame machine\n",
+         printWorkDoneBeforeDateAndMachine, findWorkDoneBeforeDateAndMachine,
+         (frameCollection, datetime.datetime(2023, 3, 25), "Flame")),
+        ("3). Work done on hpsans13 on date 3-26-2023\n", printWorkDoneOnAndDate,
+         findWorkDoneOnAndDate, (frameCollection, 'hpsans13', datetime.datetime(2023, 3, 26))),
+        ("4). Name of all users who worked on a flame machine\n",
+         printAllUsersByMachineType, findAllUsersByMachineType,
+         (summaryCollection, "Flame")),
+    ]
+
+# runs the report queries one after the other and prints them
+def printReports(videoFiles):
+    for title, printReport, _, reportArgs in databaseReports(videoFiles):
+        print(title)
+        with profileStage("reports"):
+            printReport(*reportArgs)
+
+# runs a report query and returns its documents
+def profiledQuery(query, reportArgs):
+    with profileStage("reports") as stage:
+        documents = list(query(*reportArgs))
+        stage["items"] += len(documents)
+    return documents
+
+# runs the report queries at once in a pool of concurrency threads; the reports
+# are still printed in their order, each one as soon as it and the reports before
+# it are done
+async def printReportsAsync(videoFiles, concurrency=4):
+    import asyncio
+    import concurrent.futures
+    loop = asyncio.get_running_loop()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        reports = databaseReports(videoFiles)
+        queries = [loop.run_in_executor(
+            executor, lambda query=query, reportArgs=reportArgs: profiledQuery(query, reportArgs))
+            for _, _, query, reportArgs in reports]
+        for (title, printReport, _, reportArgs), documents in zip(reports, queries):
+            print(title)
+            printReport(*reportArgs, await documents)
+
+
+# writes one batch of operations unordered (one round trip) and adds the
+# inserted, skipped (already stored) and failed rows to the summary
+def writeBatch(collection, batch, summary):
+    import pymongo
+    try:
+        with profileStage("mongo writes", len(batch)):
+            details = collection.bulk_write(batch, ordered=False).bulk_api_result
+    except pymongo.errors.BulkWriteError as error:
+        # the other operations of an unordered batch are still written
+        details = error.details
+        summary["failed"] += len(details["writeErrors"])
+    summary["inserted"] += details["nInserted"] + details["nUpserted"]
+    summary["skipped"] += details["nMatched"]
+
+# groups the operations into lists of batchSize
+def operationBatches(operations, batchSize):
+    batch = []
+    for operation in operations:
+        batch.append(operation)
+        if len(batch) >= batchSize:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# writes the operations in batches of batchSize
+def bulkWriteInBatches(collection, operations, batchSize, summary):
+    for batch in operationBatches(operations, batchSize):
+        writeBatch(collection, batch, summary)
+    return summary
+
+# upserts the document on the key fields so storing the same rows again
+# leaves the existing document untouched instead of duplicating it; the
+# setFields are also updated on an existing document
+def upsertOperation(document, keyFields, setFields=()):
+    import pymongo
+    update = {"$setOnInsert": {field: value for field, value in document.items()
+                               if field not in setFields}}
+    if setFields:
+        update["$set"] = {field: document[field] for field in setFields}
+    return pymongo.UpdateOne({field: document[field] for field in keyFields},
+                             update, upsert=True)
+
+
+# the storage host of a location: its first path, after the flame secondary path
+def locationHost(location):
+    return location.split(" ")[-1].split("/")[0]
+
+# the document stored in the frame collection for one frame range; the range is
+# also stored as numbers so it can be queried with an index, and the machine and
+# host are stored so the reports do not have to join or scan the locations
+def frameDocument(userOnFile, dateOfFile, location, frameStart, frameEnd, sourceFile,
+                  machine):
+    return {
+        "sourceFile": sourceFile,
+        "userOnFile": userOnFile,
+        "machine": machine,
+        "dateOfFile": dateOfFile,
+        "location": location,
+        "host": locationHost(location),
+        "frame_range": formatFrameRange(frameStart, frameEnd),
+        "frame_start": frameStart,
+        "frame_end": frameEnd
+    }
+
+
+# gets the collections of the video files database and indexes the fields the
+# upserts and the reports look up
+def videoFilesCollections():
     # creates a database called video files
-    videoFiles = myClient["videoFiles"]
+    videoFiles = mongoClient()["videoFiles"]
 
     # create a collection called employee
     employeeCollection = videoFiles["employee"]
@@ -344,54 +1203,415 @@ def storeInMongoDB(xytech, files):
     # create a collection called frame
     frameCollection = videoFiles["frame"]
 
-    # get the script runner from the host machine
-    scriptRunner = ""
+    # index the fields the upserts look up
+    employeeCollection.create_index(
+        [("userOnFile", 1), ("dateOfFile", 1), ("machine", 1)])
+    frameCollection.create_index(
+        [("userOnFile", 1), ("dateOfFile", 1), ("location", 1), ("frame_range", 1)])
+    createFrameRangeIndex(frameCollection)
+    frameCollection.create_index("sourceFile")
+
+    # create a collection called work summary
+    summaryCollection = videoFiles["workSummary"]
+    createReportIndexes(frameCollection, summaryCollection)
+    return employeeCollection, frameCollection, summaryCollection
+
+# indexes the fields the reports look up in the frame and work summary collections
+def createReportIndexes(frameCollection, summaryCollection):
+    frameCollection.create_index([("machine", 1), ("dateOfFile", 1)])
+    frameCollection.create_index([("host", 1), ("dateOfFile", 1)])
+    summaryCollection.create_index(
+        [("userOnFile", 1), ("machine", 1), ("dateOfFile", 1), ("host", 1)], unique=True)
+    summaryCollection.create_index([("machine", 1), ("dateOfFile", 1)])
+    summaryCollection.create_index([("host", 1), ("dateOfFile", 1)])
+
+# adds the frames and ranges of each record to the work summary of its host while
+# the records are written
+def countWorkPerHost(records, hosts):
+    for location, start, end in records:
+        host = locationHost(location)
+        if host not in hosts:
+            hosts[host] = {"frameCount": 0, "rangeCount": 0,
+                           "firstFrame": start, "lastFrame": end}
+        counts = hosts[host]
+        counts["frameCount"] += end - start + 1
+        counts["rangeCount"] += 1
+        counts["firstFrame"] = min(counts["firstFrame"], start)
+        counts["lastFrame"] = max(counts["lastFrame"], end)
+        yield location, start, end
+
+# the upserts of the work summary of a machine file once its rows are written: one
+# document per user, machine, date and host with the number of frames and ranges
+# and the first and last frame; a machine file holds all the work of its user,
+# machine and date, so storing it again sets the same counts
+def workSummaryOperations(workSummary):
+    import pymongo
+    return [pymongo.UpdateOne(dict(workSummary["key"], host=host), {"$set": counts},
+                              upsert=True)
+            for host, counts in workSummary["hosts"].items()]
+
+# the user running the script on the host machine
+def scriptRunnerName():
     try:
         # if using windows
-        scriptRunner = os.getlogin()
+        return os.getlogin()
     except OSError:
         # otherwise in linux
-        scriptRunner = subprocess.check_output("whoami").decode("utf-8").strip()
+        return subprocess.check_output("whoami").decode("utf-8").strip()
+
+# returns the employee upsert of a parsed machine file, its merged (location,
+# start, end) records and its work summary, counted while the records are read
+def machineFileWork(xytech, key, file, locationIndex, scriptRunner, submittedDate):
+    machine, userOnFile, dateOfFile = key.split("_")
+
+    dateOfFile = datetime.datetime.strptime(
+        dateOfFile.split(".")[0], "%Y%m%d").isoformat()
+
+    # employee data for the employee collection
+    employeeOperation = upsertOperation(
+        {"scriptRunner": scriptRunner,
+         "machine": machine,
+         "userOnFile": userOnFile,
+         "dateOfFile": dateOfFile,
+         "submittedDate": submittedDate
+         }, ("userOnFile", "dateOfFile", "machine"))
+
+    currentFrameAndLocation = ()
+    if (machine == "Flame"):
+        currentFrameAndLocation = mergeFilesForXytechAndFlameByPath(
+            xytech, file, locationIndex)
+    elif (machine == "Baselight"):
+        currentFrameAndLocation = mergeFilesForXytechAndBaselightByPath(
+            xytech, file, locationIndex)
+    else:
+        if (args.verbose):
+            print("Machine not supported")
+
+    workSummary = {"key": {"userOnFile": userOnFile, "machine": machine,
+                           "dateOfFile": dateOfFile}, "hosts": {}}
+
+    records = countWorkPerHost(
+        profileIterator("merge", currentFrameAndLocation), workSummary["hosts"])
+    return employeeOperation, records, workSummary
+
+# returns the employee upsert of a parsed machine file, the upserts of its frame
+# rows, created lazily while they are written, and its work summary, counted while
+# the frame rows are created
+def machineFileOperations(xytech, key, file, locationIndex, scriptRunner, submittedDate):
+    employeeOperation, records, workSummary = machineFileWork(
+        xytech, key, file, locationIndex, scriptRunner, submittedDate)
+    userOnFile, machine, dateOfFile = operator.itemgetter(
+        "userOnFile", "machine", "dateOfFile")(workSummary["key"])
+
+    # the work done data for the frame collection; rows stored before the machine
+    # and host fields existed get them when they are stored again
+    frameOperations = (upsertOperation(
+        frameDocument(userOnFile, dateOfFile, location, start, end, key, machine),
+        ("userOnFile", "dateOfFile", "location", "frame_range"),
+        ("sourceFile", "machine", "host"))
+        for location, start, end in records)
+    return employeeOperation, frameOperations, workSummary
+
+# the frame row upsert of a range consolidated from several machine files: the
+# users, machines and files are lists (a report looking up one user still finds
+# the rows the user worked on), the date is the one of the first file and the
+# rows are keyed by the list of users
+def consolidatedFrameOperation(location, start, end, sourceFiles):
+    machines, users = [], []
+    dateOfFile = datetime.datetime.strptime(
+        sourceFiles[0].split("_")[2].split(".")[0], "%Y%m%d").isoformat()
+    for sourceFile in sourceFiles:
+        machine, userOnFile, _ = sourceFile.split("_")
+        if machine not in machines:
+            machines.append(machine)
+        if userOnFile not in users:
+            users.append(userOnFile)
+    document = frameDocument(users, dateOfFile, location, start, end, list(sourceFiles), machines)
+    document["consolidated"] = True
+    return upsertOperation(
+        document, ("userOnFile", "dateOfFile", "location", "frame_range", "consolidated"),
+        ("sourceFile", "machine", "host"))
+
+
+# the rows of each file are tagged with the file name; with replaceRows the rows
+# stored before for a file are removed first, so a changed file replaces its rows.
+# With consolidate the ranges of the files are unioned per location and each
+# range is stored once with all the files it comes from; the rows and summaries
+# stored before for any of the files are always removed first, as a consolidated
+# row is keyed by its users and would otherwise stay next to the new one. A
+# consolidated row is marked as such, and a store without consolidate removes
+# the consolidated rows of its files so they are not updated as plain rows
+def storeInMongoDB(xytech, files, batchSize=1000, replaceRows=False, consolidate=False):
+    employeeCollection, frameCollection, summaryCollection = videoFilesCollections()
+
+    # get the script runner from the host machine
+    scriptRunner = scriptRunnerName()
 
     # current date
     submittedDate = datetime.datetime.now().isoformat()
 
+    # the location index is built once and shared by every machine file
+    locationIndex = buildLocationIndex(xytech)
+
+    summary = {"inserted": 0, "skipped": 0, "failed": 0}
+    employeeOperations = []
+    consolidatedFiles = []
+    consolidatedSummaries = []
     for key, file in files.items():
-        machine, userOnFile, dateOfFile = key.split("_")
-        
-        dateOfFile = datetime.datetime.strptime(
-            dateOfFile.split(".")[0], "%Y%m%d").isoformat()
-
-        # insert employee data into the employee collection
-        employeeCollection.insert_one(
-            {"scriptRunner": scriptRunner,
-             "machine": machine,
-             "userOnFile": userOnFile,
-             "dateOfFile": dateOfFile,
-             "submittedDate": submittedDate
-             }
-        )
-        if (machine == "Flame"):
-            currentFrameAndLocation = mergeFilesForXytechAndFlameByPath(
-                xytech, file)
-        elif (machine == "Baselight"):
-            currentFrameAndLocation = mergeFilesForXytechAndBaselightByPath(
-                xytech, file)
+        if consolidate:
+            employeeOperation, records, workSummary = machineFileWork(
+                xytech, key, file, locationIndex, scriptRunner, submittedDate)
+            consolidatedFiles.append((key, records))
+            consolidatedSummaries.append(workSummary)
         else:
+            employeeOperation, frameOperations, workSummary = machineFileOperations(
+                xytech, key, file, locationIndex, scriptRunner, submittedDate)
+        employeeOperations.append(employeeOperation)
+
+        if replaceRows or consolidate:
+            frameCollection.delete_many({"sourceFile": key})
+            summaryCollection.delete_many(workSummary["key"])
+        else:
+            frameCollection.delete_many({"sourceFile": key, "consolidated": True})
+
+        if not consolidate:
+            # write the work done data into the frame collection in batches
+            bulkWriteInBatches(frameCollection, frameOperations, batchSize, summary)
+            bulkWriteInBatches(summaryCollection, workSummaryOperations(workSummary),
+                               batchSize, {"inserted": 0, "skipped": 0, "failed": 0})
+
+    if consolidate:
+        frameOperations = (
+            consolidatedFrameOperation(location, start, end, sourceFiles)
+            for location, start, end, sourceFiles in consolidateRanges(consolidatedFiles))
+        bulkWriteInBatches(frameCollection, frameOperations, batchSize, summary)
+        # the work summaries of the files were counted while their ranges were read
+        for workSummary in consolidatedSummaries:
+            bulkWriteInBatches(summaryCollection, workSummaryOperations(workSummary),
+                               batchSize, {"inserted": 0, "skipped": 0, "failed": 0})
+
+    bulkWriteInBatches(employeeCollection, employeeOperations, batchSize,
+                       {"inserted": 0, "skipped": 0, "failed": 0})
+    if (args.verbose):
+        print(f"frame rows inserted: {summary['inserted']}, "
+              f"skipped: {summary['skipped']}, failed: {summary['failed']}")
+    return summary
+
+# stores the work order like storeInMongoDB, but the xytech and machine files are
+# parsed in a pool of threads while the rows of the files already parsed are
+# written: at most concurrency bulk writes are in flight at once, each one on its
+# own thread of the shared client
+async def storeInMongoDBAsync(xytechFile, machineFiles, batchSize=1000,
+                              replaceRows=False, concurrency=4):
+    import asyncio
+    import concurrent.futures
+    loop = asyncio.get_running_loop()
+    employeeCollection, frameCollection, summaryCollection = videoFilesCollections()
+    scriptRunner = scriptRunnerName()
+    submittedDate = datetime.datetime.now().isoformat()
+
+    summary = {"inserted": 0, "skipped": 0, "failed": 0}
+    writesInFlight = asyncio.Semaphore(concurrency)
+
+    async def parse(file):
+        return file, await loop.run_in_executor(parseExecutor, parseMachineFile, file)
+
+    async def write(collection, batch):
+        batchSummary = {"inserted": 0, "skipped": 0, "failed": 0}
+        try:
+            await loop.run_in_executor(writeExecutor, writeBatch, collection, batch, batchSummary)
+        finally:
+            writesInFlight.release()
+        return batchSummary
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as parseExecutor, \
+            concurrent.futures.ThreadPoolExecutor(concurrency) as writeExecutor:
+        parsedXytech = loop.run_in_executor(
+            parseExecutor, parseXytechFile, xytechFile)
+        parsedFiles = [asyncio.ensure_future(parse(file)) for file in machineFiles]
+        xytech = await parsedXytech
+        locationIndex = buildLocationIndex(xytech)
+
+        writes = []
+        employeeOperations = []
+        workSummaries = []
+        # the files are written in the order they finish parsing
+        for parsedFile in asyncio.as_completed(parsedFiles):
+            file, otherFile = await parsedFile
+            if otherFile is None:
+                continue
+            key = os.path.basename(file)
+            employeeOperation, frameOperations, workSummary = machineFileOperations(
+                xytech, key, otherFile, locationIndex, scriptRunner, submittedDate)
+            employeeOperations.append(employeeOperation)
+            workSummaries.append(workSummary)
+
+            if replaceRows:
+                await loop.run_in_executor(
+                    writeExecutor, frameCollection.delete_many, {"sourceFile": key})
+                await loop.run_in_executor(
+                    writeExecutor, summaryCollection.delete_many, workSummary["key"])
+            else:
+                await loop.run_in_executor(
+                    writeExecutor, frameCollection.delete_many,
+                    {"sourceFile": key, "consolidated": True})
+
+            for batch in operationBatches(frameOperations, batchSize):
+                await writesInFlight.acquire()
+                writes.append(asyncio.ensure_future(write(frameCollection, batch)))
+
+        for batchSummary in await asyncio.gather(*writes):
+            for count in summary:
+                summary[count] += batchSummary[count]
+        await loop.run_in_executor(
+            writeExecutor, bulkWriteInBatches, employeeCollection, employeeOperations,
+            batchSize, {"inserted": 0, "skipped": 0, "failed": 0})
+        # the work summaries are complete once every frame row was created
+        summaryOperations = [operation for workSummary in workSummaries
+                             for operation in workSummaryOperations(workSummary)]
+        await loop.run_in_executor(
+            writeExecutor, bulkWriteInBatches, summaryCollection, summaryOperations,
+            batchSize, {"inserted": 0, "skipped": 0, "failed": 0})
+
+    if (args.verbose):
+        print(f"frame rows inserted: {summary['inserted']}, "
+              f"skipped: {summary['skipped']}, failed: {summary['failed']}")
+    return summary
+
+
+# returns the manifest entry of the file: its name, size, modification time and
+# content hash; the hash of the previous entry is reused when the size and
+# modification time did not change, so unchanged files are not read
+def fileFingerprint(file, previousEntry=None):
+    fileStat = os.stat(file)
+    entry = {"name": os.path.basename(file), "size": fileStat.st_size,
+             "mtime": fileStat.st_mtime_ns}
+    if (previousEntry and previousEntry["size"] == entry["size"]
+            and previousEntry["mtime"] == entry["mtime"]):
+        entry["hash"] = previousEntry["hash"]
+        return entry
+
+    fileHash = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            fileHash.update(block)
+    entry["hash"] = fileHash.hexdigest()
+    return entry
+
+# loads the manifest of the processed files by file name, from the manifest
+# collection of the database or from a local json file
+def loadManifest(manifest):
+    if manifest == "DB":
+        return {entry["name"]: entry for entry in
+                mongoClient()["videoFiles"]["manifest"].find({}, {"_id": 0})}
+    try:
+        with open(manifest, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+# saves the entries of the files processed by this run into the manifest
+def saveManifest(manifest, entries):
+    if not entries:
+        return
+    if manifest == "DB":
+        import pymongo
+        mongoClient()["videoFiles"]["manifest"].bulk_write(
+            [pymongo.ReplaceOne({"name": entry["name"]}, entry, upsert=True)
+             for entry in entries], ordered=False)
+        return
+    manifestEntries = loadManifest(manifest)
+    manifestEntries.update((entry["name"], entry) for entry in entries)
+    temporaryPath = f"{manifest}.{os.getpid()}.tmp"
+    with open(temporaryPath, "w") as f:
+        json.dump(manifestEntries, f, indent=1)
+    os.replace(temporaryPath, manifest)
+
+# returns the machine files of the work order that changed since they were stored
+# (or whose xytech work order changed) and the manifest entries to save once
+# they are stored
+def selectChangedFiles(xytechFile, machineFiles, manifestEntries):
+    xytechEntry = fileFingerprint(
+        xytechFile, manifestEntries.get(os.path.basename(xytechFile)))
+    changedFiles = []
+    entries = [xytechEntry]
+    for file in machineFiles:
+        previousEntry = manifestEntries.get(os.path.basename(file))
+        entry = fileFingerprint(file, previousEntry)
+        entry["xytechHash"] = xytechEntry["hash"]
+        if (previousEntry and previousEntry["hash"] == entry["hash"]
+                and previousEntry.get("xytechHash") == entry["xytechHash"]):
             if (args.verbose):
-                print("Machine not supported")
+                print(f"Skipping unchanged {entry['name']}")
+        else:
+            changedFiles.append(file)
+        entries.append(entry)
+    # the consolidated rows mix the files of the work order, a changed file stores
+    # all of them again
+    if args.consolidate and changedFiles:
+        changedFiles = list(machineFiles)
+    return changedFiles, entries
+
+# probed videos of this run keyed by (path, modification time, size)
+probedVideos = {}
+
+# runs ffprobe once in json mode and returns the duration in seconds, the exact
+# frame rate as a fraction (24000/1001 stays exact), the exact time of the first
+# frame, the number of frames and the video stream info; the result is cached in memory and, with cacheDirectory,
+# on disk so a video is only probed again when it changes
+def probeVideo(videoPath, cacheDirectory=None):
+    videoStat = os.stat(videoPath)
+    videoKey = (os.path.realpath(videoPath), videoStat.st_mtime_ns, videoStat.st_size)
+    if videoKey in probedVideos:
+        return probedVideos[videoKey]
+
+    probePath = None
+    probeOutput = None
+    if cacheDirectory:
+        probePath = os.path.join(cacheDirectory, "probes", hashlib.sha1(
+            repr(videoKey).encode("utf-8")).hexdigest() + ".json")
+        try:
+            with open(probePath, "r") as f:
+                probeOutput = json.load(f)
+        except (OSError, ValueError):
+            probeOutput = None
+
+    if probeOutput is None:
+        ffprobe = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+                   'format=duration:stream=index,codec_name,width,height,r_frame_rate,'
+                   'avg_frame_rate,nb_frames,duration,time_base,start_pts', '-of', 'json',
+                   videoPath]
+        probeOutput = json.loads(subprocess.check_output(ffprobe))
+        if probePath:
+            os.makedirs(os.path.dirname(probePath), exist_ok=True)
+            temporaryPath = f"{probePath}.{os.getpid()}.tmp"
+            with open(temporaryPath, "w") as f:
+                json.dump(probeOutput, f)
+            os.replace(temporaryPath, probePath)
+
+    stream = probeOutput["streams"][0]
+    framesPerSecond = fractions.Fraction(stream["r_frame_rate"])
+    duration = fractions.Fraction(
+        stream.get("duration") or probeOutput["format"]["duration"])
+    # the container does not always store the number of frames
+    if str(stream.get("nb_frames", "")).isnumeric():
+        frameCount = int(stream["nb_frames"])
+    else:
+        frameCount = round(duration * framesPerSecond)
+
+    # the exact time of the first frame, the frames are counted from it
+    startTime = 0
+    if isinstance(stream.get("start_pts"), int) and stream.get("time_base"):
+        startTime = stream["start_pts"] * fractions.Fraction(stream["time_base"])
 
-        # insert work done data into the frame collection
-        for line in currentFrameAndLocation.splitlines():
-            location, frame = line.split(",")
-            frameCollection.insert_one(
-                {
-                    "userOnFile": userOnFile,
-                    "dateOfFile": dateOfFile,
-                    "location": location,
-                    "frame_range": frame
-                }
-            )
+    probedVideos[videoKey] = {
+        "duration": float(duration),
+        "framesPerSecond": framesPerSecond,
+        "startTime": startTime,
+        "frameCount": frameCount,
+        "stream": stream,
+    }
+    return probedVideos[videoKey]
 
 
 def timeCodeToFrames(timeCode):
@@ -402,13 +1622,296 @@ def timeCodeToFrames(timeCode):
         int(frames)
 
 
+# the SMPTE time code HH:MM:SS:FF of the frame, the last field is the frame
+# within the second; timeCodeToFrames reads it back
 def frameToTimeCode(frame):
     frameHour = frame // frame_per_second // 60 // 60
-    frameSecond = frame // frame_per_second // 60 % 60
-    frameMinute = frame // frame_per_second % 60
+    frameMinute = frame // frame_per_second // 60 % 60
+    frameSecond = frame // frame_per_second % 60
     frameff = int(frame % frame_per_second)
-    return "{:02d}:{:02d}:{:02d}.{:02d}".format(frameHour,  frameSecond, frameMinute, frameff)
+    return "{:02d}:{:02d}:{:02d}:{:02d}".format(
+        int(frameHour), int(frameMinute), int(frameSecond), frameff)
+
+# the exact time of the frame from the first frame as a fraction of seconds; the
+# input -ss of ffmpeg is relative to the start of the file, ffmpeg adds the start
+# time itself
+def frameTime(videoInfo, frame):
+    return frame / videoInfo["framesPerSecond"]
+
+# formats an exact time as the seconds ffmpeg reads, rounded down to its
+# microseconds so the frame at that time is not skipped
+def ffmpegTime(seconds):
+    microseconds = int(seconds * 1000000)
+    return f"{microseconds // 1000000}.{microseconds % 1000000:06d}"
+
+# keyframe indexes of this run keyed like probedVideos
+indexedKeyframes = {}
+
+# returns the sorted numbers of the keyframes of the video, read from the packet
+# flags with ffprobe (the packets are only demuxed, not decoded); the index is
+# cached in memory and, with cacheDirectory, on disk next to the probes
+def keyframeIndex(videoPath, cacheDirectory=None):
+    videoStat = os.stat(videoPath)
+    videoKey = (os.path.realpath(videoPath), videoStat.st_mtime_ns, videoStat.st_size)
+    if videoKey in indexedKeyframes:
+        return indexedKeyframes[videoKey]
+
+    indexPath = None
+    if cacheDirectory:
+        indexPath = os.path.join(cacheDirectory, "keyframes", hashlib.sha1(
+            repr(videoKey).encode("utf-8")).hexdigest() + ".json")
+        try:
+            with open(indexPath, "r") as f:
+                indexedKeyframes[videoKey] = json.load(f)
+            return indexedKeyframes[videoKey]
+        except (OSError, ValueError):
+            pass
+
+    videoInfo = probeVideo(videoPath, cacheDirectory)
+    timeBase = fractions.Fraction(videoInfo["stream"]["time_base"])
+    ffprobe = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'packet=pts,flags', '-of', 'json', videoPath]
+    packets = json.loads(subprocess.check_output(ffprobe)).get("packets", [])
+    keyframes = sorted({
+        round((packet["pts"] * timeBase - videoInfo["startTime"]) * videoInfo["framesPerSecond"])
+        for packet in packets
+        if "K" in packet.get("flags", "") and isinstance(packet.get("pts"), int)})
+    # without keyframes every seek starts from the first frame
+    if not keyframes or keyframes[0] > 0:
+        keyframes.insert(0, 0)
+
+    if indexPath:
+        os.makedirs(os.path.dirname(indexPath), exist_ok=True)
+        temporaryPath = f"{indexPath}.{os.getpid()}.tmp"
+        with open(temporaryPath, "w") as f:
+            json.dump(keyframes, f)
+        os.replace(temporaryPath, indexPath)
+    indexedKeyframes[videoKey] = keyframes
+    return keyframes
+
+# the keyframe at or before the frame, where decoding has to start
+def precedingKeyframe(keyframes, frame):
+    return keyframes[max(bisect.bisect_right(keyframes, frame) - 1, 0)]
+
+# the ffmpeg arguments extracting the frames that follow keyframe as PNG images
+# written one after the other to stdout: the input is seeked to the exact time of
+# the keyframe, so only the frames from the keyframe on are decoded, and the select
+# filter keeps the frames by their position after it
+def seekedExtractionCommand(videoPath, videoInfo, keyframe, frames):
+    selectFrames = "+".join(f"eq(n,{frame - keyframe})" for frame in frames)
+    return ['ffmpeg', '-v', 'error', '-ss', ffmpegTime(frameTime(videoInfo, keyframe)),
+            '-i', videoPath, '-vf', f"select='{selectFrames}',scale=size={thumbnail_size}",
+            '-vsync', '0', '-frames:v', str(len(frames)), '-f', 'image2pipe', '-c:v', 'png',
+            '-']
+
+# every PNG image starts with this signature
+pngSignature = b"\x89PNG\r\n\x1a\n"
+
+# splits the PNG images written one after the other by image2pipe; each image ends
+# with its IEND chunk, a truncated last image is left out
+def splitPngImages(data):
+    images = []
+    start = 0
+    while data.startswith(pngSignature, start):
+        position = start + len(pngSignature)
+        while position + 8 <= len(data):
+            chunkLength, chunkType = struct.unpack(">I4s", data[position:position + 8])
+            # the length, type and crc of the chunk surround its data
+            position += 12 + chunkLength
+            if chunkType == b"IEND":
+                break
+        if position > len(data) or chunkType != b"IEND":
+            break
+        images.append(data[start:position])
+        start = position
+    return images
+
+# runs the ffmpeg extraction and returns the PNG images it wrote to stdout; raises
+# if ffmpeg fails or takes longer than timeout seconds (the process is killed)
+def runExtraction(command, timeout=None):
+    result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, timeout=timeout, check=True)
+    return splitPngImages(result.stdout)
+
+# returns the PNG image of the frame of the video, decoding from the keyframe
+# before it; raises if ffmpeg fails or takes longer than timeout seconds
+def extractThumbnail(videoPath, frame, timeout=None, cacheDirectory=None):
+    videoInfo = probeVideo(videoPath, cacheDirectory)
+    keyframe = precedingKeyframe(keyframeIndex(videoPath, cacheDirectory), frame)
+    images = runExtraction(
+        seekedExtractionCommand(videoPath, videoInfo, keyframe, [frame]), timeout)
+    if not images:
+        raise FileNotFoundError(f"frame {frame} is not in the video")
+    return images[0]
+
+# submits task(item) for each item to the executor and yields (item, future) in the
+# order of the items; only window tasks are submitted ahead of the one yielded, so
+# the results waiting to be taken stay bounded
+def submitInWindow(executor, task, items, window):
+    futures = collections.deque()
+    for item in items:
+        futures.append((item, executor.submit(task, item)))
+        if len(futures) >= window:
+            yield futures.popleft()
+    while futures:
+        yield futures.popleft()
+
+# extracts the thumbnails of the frames with at most workers ffmpeg processes
+# running at once (one per core by default) and yields (frame, image, error) in
+# the order of the frames, where the image is the PNG data; a failed extraction
+# yields its error instead of stopping the others
+def extractThumbnails(videoPath, frames, workers=None, timeout=None, cacheDirectory=None):
+    workers = workers or os.cpu_count()
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for frame, future in submitInWindow(
+                executor, lambda frame: extractThumbnail(
+                    videoPath, frame, timeout, cacheDirectory), frames, 2 * workers):
+            try:
+                yield frame, future.result(), None
+            except (subprocess.SubprocessError, OSError) as error:
+                yield frame, None, error
+
+# returns the PNG images of the frames following keyframe extracted in one ffmpeg
+# run: the frames after the keyframe are decoded once and the images come in frame
+# order; decoding stops after the last requested frame
+def extractThumbnailChunk(videoPath, keyframe, frames, timeout=None, cacheDirectory=None):
+    videoInfo = probeVideo(videoPath, cacheDirectory)
+    return runExtraction(
+        seekedExtractionCommand(videoPath, videoInfo, keyframe, frames), timeout)
+
+# batch version of extractThumbnails: the frames are sorted and split in chunks of
+# at most chunkSize frames, each one extracted by one ffmpeg run seeked to the
+# keyframe before its first frame (the runs share the same bounded pool), and
+# (frame, image, error) is yielded in frame order. A frame joins the chunk before
+# it when it follows the same keyframe or is at most seekFrames after the last
+# frame of the chunk: decoding forward is cheaper than starting another ffmpeg,
+# so an all-intra video (where every frame is a keyframe) is still decoded in a
+# few runs
+def extractThumbnailsInBatches(videoPath, frames, workers=None, timeout=None,
+                               chunkSize=200, cacheDirectory=None, seekFrames=50):
+    frames = sorted(set(frames))
+    keyframes = keyframeIndex(videoPath, cacheDirectory) if frames else [0]
+    chunks = []
+    for frame in frames:
+        keyframe = precedingKeyframe(keyframes, frame)
+        if (chunks and len(chunks[-1][1]) < chunkSize
+                and (chunks[-1][0] == keyframe or frame - chunks[-1][1][-1] <= seekFrames)):
+            chunks[-1][1].append(frame)
+        else:
+            chunks.append((keyframe, [frame]))
+    workers = workers or os.cpu_count()
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for (keyframe, chunk), future in submitInWindow(
+                executor, lambda chunk: extractThumbnailChunk(
+                    videoPath, chunk[0], chunk[1], timeout, cacheDirectory),
+                chunks, 2 * workers):
+            try:
+                images = future.result()
+                error = None
+            except (subprocess.SubprocessError, OSError) as chunkError:
+                images = []
+                error = chunkError
+            # the images come in the order the frames were selected
+            for imageNumber, middleFrame in enumerate(chunk):
+                if error:
+                    yield middleFrame, None, error
+                elif imageNumber >= len(images):
+                    yield middleFrame, None, FileNotFoundError(
+                        f"frame {middleFrame} is not in the video")
+                else:
+                    yield middleFrame, images[imageNumber], None
+
+# identifies the video in the thumbnail cache by its size, modification time and
+# a hash of its first and last megabyte, so the key changes whenever the video does
+def videoCacheKey(videoPath):
+    videoStat = os.stat(videoPath)
+    videoHash = hashlib.sha1(
+        f"{videoStat.st_size}:{videoStat.st_mtime_ns}".encode("utf-8"))
+    with open(videoPath, "rb") as f:
+        videoHash.update(f.read(1 << 20))
+        f.seek(max(videoStat.st_size - (1 << 20), 0))
+        videoHash.update(f.read(1 << 20))
+    return videoHash.hexdigest()
+
+# path of the cached thumbnail of a frame of the video at the thumbnail size
+def thumbnailCachePath(cacheDirectory, videoKey, frame):
+    return os.path.join(cacheDirectory, videoKey, thumbnail_size, f"{frame}.png")
+
+# writes the data to destination through a temporary file renamed into place, so
+# a concurrent run never sees a partially written file
+def writeFileAtomically(destination, data):
+    temporaryPath = f"{destination}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporaryPath, "wb") as f:
+        f.write(data)
+    os.replace(temporaryPath, destination)
+
+# removes the least recently used files (thumbnails or parsed files) until the
+# cache fits in maxBytes; files already removed by a concurrent run are skipped
+def evictCacheFiles(cacheDirectory, maxBytes, stats):
+    cachedFiles = []
+    totalBytes = 0
+    for directory, _, fileNames in os.walk(cacheDirectory):
+        for fileName in fileNames:
+            # files still being written by a concurrent run are left alone
+            if fileName.endswith(".tmp"):
+                continue
+            path = os.path.join(directory, fileName)
+            try:
+                fileStat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            cachedFiles.append((fileStat.st_mtime, fileStat.st_size, path))
+            totalBytes += fileStat.st_size
+    for _, size, path in sorted(cachedFiles):
+        if totalBytes <= maxBytes:
+            break
+        try:
+            os.remove(path)
+            stats["evicted"] += 1
+        except FileNotFoundError:
+            pass
+        totalBytes -= size
+
+# looks up the frames in the thumbnail cache and only extracts the missing ones with
+# extract(frames), a generator of (frame, image, error) like extractThumbnails
+# yielding them in the order of frames; cached images are read as they are yielded
+# and new ones are added to the cache, hits and misses are counted in stats;
+# yields (frame, image, error) in the order of frames
+def extractThumbnailsWithCache(videoPath, frames, cacheDirectory, extract, stats):
+    videoKey = videoCacheKey(videoPath)
+    os.makedirs(os.path.dirname(
+        thumbnailCachePath(cacheDirectory, videoKey, 0)), exist_ok=True)
+    missingFrames = [frame for frame in frames if not os.path.exists(
+        thumbnailCachePath(cacheDirectory, videoKey, frame))]
+    stats["misses"] += len(missingFrames)
+    stats["hits"] += len(frames) - len(missingFrames)
+    missingThumbnails = extract(missingFrames)
+    missingFrames = set(missingFrames)
 
+    try:
+        for frame in frames:
+            cachePath = thumbnailCachePath(cacheDirectory, videoKey, frame)
+            if frame in missingFrames:
+                frame, image, error = next(missingThumbnails)
+                if not error:
+                    writeFileAtomically(cachePath, image)
+                yield frame, image, error
+                continue
+            try:
+                with open(cachePath, "rb") as f:
+                    image = f.read()
+                # the modification time is used as the last use for the eviction
+                os.utime(cachePath)
+            except FileNotFoundError:
+                # removed by a concurrent run since it was looked up
+                with contextlib.closing(extract([frame])) as extraction:
+                    yield next(extraction)
+                continue
+            yield frame, image, None
+    finally:
+        missingThumbnails.close()
 
 # finds the middle frame of a range of frames
 def findMiddleFrameFromRange(frameRange):
@@ -424,59 +1927,621 @@ def secondsToTimeCode(seconds):
     frames = int((seconds-int(seconds)) * frame_per_second)
     return '{:02d}:{:02d}:{:02d}:{:02d}'.format(hours, minutes, seconds, frames)
 
+# returns the first and last frame of a "start-end" range (or of a single frame)
+def frameRangeBounds(frameRange):
+    start, _, end = frameRange.partition("-")
+    return int(start), int(end or start)
+
+# index used by the range queries on the numeric frame fields
+def createFrameRangeIndex(collection):
+    collection.create_index([("frame_end", 1), ("frame_start", 1)])
+
+# adds the numeric frame_start and frame_end fields to the frame documents stored
+# before they existed; the fields are computed by the server in one update
+def migrateFrameRanges(collection):
+    splitRange = {"$split": ["$frame_range", "-"]}
+    result = collection.update_many(
+        {"frame_end": {"$exists": False}, "frame_range": {"$type": "string"}},
+        [{"$set": {
+            "frame_start": {"$toInt": {"$arrayElemAt": [splitRange, 0]}},
+            "frame_end": {"$toInt": {"$arrayElemAt": [splitRange, -1]}}
+        }}])
+    createFrameRangeIndex(collection)
+    return result.modified_count
+
+# adds the machine and host fields to the frame documents stored before they
+# existed and rebuilds the work summary collection from the frame collection; the
+# machine comes from the employee document of the user and date
+def migrateWorkSummary(videoFiles):
+    import pymongo
+    frameCollection = videoFiles["frame"]
+    summaryCollection = videoFiles["workSummary"]
+    lastPath = {"$arrayElemAt": [{"$split": ["$location", " "]}, -1]}
+    migrated = frameCollection.update_many(
+        {"host": {"$exists": False}},
+        [{"$set": {"host": {"$arrayElemAt": [{"$split": [lastPath, "/"]}, 0]}}}]
+    ).modified_count
+    for employee in videoFiles["employee"].find({}, {"userOnFile": 1, "dateOfFile": 1, "machine": 1}):
+        migrated += frameCollection.update_many(
+            {"userOnFile": employee["userOnFile"], "dateOfFile": employee["dateOfFile"],
+             "machine": {"$exists": False}},
+            {"$set": {"machine": employee["machine"]}}).modified_count
+    createReportIndexes(frameCollection, summaryCollection)
+
+    workSummaries = frameCollection.aggregate([
+        {"$match": {"machine": {"$exists": True}}},
+        {"$group": {
+            "_id": {"userOnFile": "$userOnFile", "machine": "$machine",
+                    "dateOfFile": "$dateOfFile", "host": "$host"},
+            "frameCount": {"$sum": {"$add": [{"$subtract": ["$frame_end", "$frame_start"]}, 1]}},
+            "rangeCount": {"$sum": 1},
+            "firstFrame": {"$min": "$frame_start"},
+            "lastFrame": {"$max": "$frame_end"}
+        }}
+    ])
+    summaryCollection.delete_many({})
+    bulkWriteInBatches(summaryCollection, (
+        pymongo.InsertOne(dict(workSummary.pop("_id"), **workSummary))
+        for workSummary in workSummaries), 1000, {"inserted": 0, "skipped": 0, "failed": 0})
+    return migrated
+
 # finds all frames whithin a video that is less than or equal to the maxFrame passed in
 # and returns a list of objects that contains the frame range, middle frame, and time code
 def findAllFramesWithinVideo(maxFrame, collection):
-    
-    # uses a regex function that splits the start and end by a dash and then compare the end
-    # to the maxFrame found in the video pass in the process argument
-    findWhenRanges = f"Number(this.frame_range.split('-')[1]) <= {maxFrame} && Number(this.frame_range.split('-')[0]) >= 0"
-
-    result = collection.find({"$or": [
-        {"frame_range": {"$regex": r"\d+-\d+"}, "$where": findWhenRanges}
-    ]})
+
+    # range query on the numeric frame fields, answered by the frame range index
+    result = collection.find(
+        {"frame_end": {"$lte": maxFrame}, "frame_start": {"$gte": 0}},
+        {"_id": 0, "location": 1, "frame_range": 1,
+         "frame_start": 1, "frame_end": 1})
     list = []
     for document in result:
         frame = document["frame_range"]
         location = document["location"]
-        # if the frame has a dash in it, then it is a range of frames
-        # and we need to find the middle frame
-        if "-" in frame:
-            middleFrame = findMiddleFrameFromRange(frame)
-            start, end = frame.split("-")
-            startTimeCode, endTimeCode = frameToTimeCode(
-                int(start)), frameToTimeCode(int(end))
-            object = {
-                "location": location,
-                "frameRange": frame,
-                "middleFrame": middleFrame,
-                "timeCodeRange": f"{startTimeCode}-{endTimeCode}",
-                "timeCode": frameToTimeCode(middleFrame),
-            }
+        start, end = document["frame_start"], document["frame_end"]
+        # only ranges of frames are shown, single frames have no middle frame
+        if start == end:
+            continue
+        middleFrame = findMiddleFrameFromRange(frame)
+        startTimeCode, endTimeCode = frameToTimeCode(
+            start), frameToTimeCode(end)
+        object = {
+            "location": location,
+            "frameRange": frame,
+            "middleFrame": middleFrame,
+            "timeCodeRange": f"{startTimeCode}-{endTimeCode}",
+            "timeCode": frameToTimeCode(middleFrame),
+        }
         list.append(object)
     return list
 
 
-def parsedMAchineFiles():
-    # read each file and store it in a dictionary
-    files = {}
-    if (args.files):
-        for file in args.files:
-            fileName = os.path.basename(file)
-            files[fileName] = readFile(file)
+# pairs each row of the video information with the thumbnail of its middle frame
+# and yields (location, frame range, time code range, PNG image or None if it
+# failed); the failed thumbnails are added to failedThumbnails
+def thumbnailRows(informationToStore, thumbnails, failedThumbnails):
+    # the rows still waiting for the thumbnail of each frame
+    rowsPerFrame = collections.Counter(info["middleFrame"] for info in informationToStore)
+    extractedThumbnails = {}
+    for info in informationToStore:
+        middleFrame = info["middleFrame"]
+
+        # the rows are sorted by their middle frame and the thumbnails come back
+        # in that order, so only the thumbnail of the current row is kept
+        while middleFrame not in extractedThumbnails:
+            extractedFrame, image, error = next(thumbnails)
+            extractedThumbnails[extractedFrame] = image, error
+            if error:
+                failedThumbnails.append((extractedFrame, error))
+        image, error = extractedThumbnails[middleFrame]
+        # the image is dropped once the last row of its frame has it
+        rowsPerFrame[middleFrame] -= 1
+        if not rowsPerFrame[middleFrame]:
+            del extractedThumbnails[middleFrame]
+
+        yield (info["location"], info["frameRange"], info["timeCodeRange"],
+               None if error else image)
+
+# creates the workbook (numbered after the first file) in constant memory mode, so
+# each row is flushed to disk as soon as the next one is written
+def openReportWorkbook(path, fileNumber):
+    if fileNumber > 1:
+        root, extension = os.path.splitext(path)
+        path = f"{root}_{fileNumber}{extension}"
+    import xlsxwriter
+    return xlsxwriter.Workbook(path, {"constant_memory": True})
+
+# adds a sheet with the headers to the workbook
+def addReportSheet(workbook, sheetNumber):
+    sheet = workbook.add_worksheet(
+        "Video Information" if sheetNumber == 1 else f"Video Information {sheetNumber}")
+
+    # headers for the sheet
+    sheet.write(0, 0, "Location")
+    sheet.write(0, 1, "Frame Range")
+    sheet.write(0, 2, "Time Code Range")
+    sheet.write(0, 3, "Thumbnail")
+    return sheet
+
+# writes the (location, frame range, time code range, PNG image) rows to the report
+# while they are produced; past rowLimit rows the report continues on a new sheet
+# or, with split "file", in a new file. The workbook keeps the embedded images
+# until its file is closed, so once they take more than imageBudget bytes the
+# report continues in a new file whatever the split, which bounds the memory of
+# the report to about imageBudget; returns the rows written, the files created,
+# the rows per second and the peak RSS of the process
+def writeReport(path, rows, rowLimit=1000000, split="sheet", imageBudget=128 * 1024 * 1024):
+    with profileStage("workbook write") as stage:
+        reportStats = writeReportRows(path, rows, rowLimit, split, imageBudget)
+        stage["items"] += reportStats["rows"]
+    return reportStats
+
+def writeReportRows(path, rows, rowLimit, split, imageBudget):
+    startTime = time.perf_counter()
+    fileCount = sheetNumber = 1
+    workbook = openReportWorkbook(path, fileCount)
+    sheet = addReportSheet(workbook, sheetNumber)
+    rowCount = sheetRow = imageBytes = 0
+
+    for location, frameRange, timeCodeRange, image in rows:
+        overBudget = bool(image) and imageBytes > 0 and imageBytes + len(image) > imageBudget
+        if sheetRow == rowLimit or overBudget:
+            if split == "file" or overBudget:
+                # the finished file is saved to free its memory; the workbook
+                # objects refer to each other, so they are only freed by the
+                # cycle collector
+                with profileStage("workbook close", 1):
+                    workbook.close()
+                workbook = sheet = None
+                gc.collect()
+                fileCount += 1
+                sheetNumber = 1
+                imageBytes = 0
+                workbook = openReportWorkbook(path, fileCount)
+            else:
+                sheetNumber += 1
+            sheet = addReportSheet(workbook, sheetNumber)
+            sheetRow = 0
+        sheetRow += 1
+        rowCount += 1
+
+        sheet.write(sheetRow, 0, location)
+        sheet.write(sheetRow, 1, frameRange)
+        sheet.write(sheetRow, 2, timeCodeRange)
+        # embed the image from memory, it is never written to a file of its own
+        if image:
+            sheet.insert_image(sheetRow, 3, f"thumbnail{rowCount}.png",
+                               {"image_data": io.BytesIO(image)})
+            imageBytes += len(image)
+
+    # close the workbook and saves it
+    with profileStage("workbook close", 1):
+        workbook.close()
+
+    elapsed = time.perf_counter() - startTime
+    return {
+        "rows": rowCount,
+        "files": fileCount,
+        "rowsPerSecond": rowCount / elapsed if elapsed else 0,
+        "peakRssMB": processMemoryPeakMB(),
+    }
+
+
+# layout of the parse cache files, all in the byte order of the machine (the
+# binary files are read back with binaryByteOrderMark): the
+# header (magic, format version, byte order mark, number of paths, padding, number
+# of frames, size of the string table), the offsets of the frames of each path (uint64, one
+# more than the paths), the offsets of each path in the string table (uint32, one
+# more than the paths), the utf-8 string table padded to 4 bytes and the frames
+# of all the paths one after the other (uint32)
+parseCacheMagic = b"SWAPARSE"
+parseCacheHeader = struct.Struct("=8sIIIIQQ")
+
+# version of the parse cache format and of the parsers writing it; cached files of
+# another version are parsed again
+parseCacheVersion = 1
+
+# returns the path in the cache directory of the parsed machine file, named by the
+# machine and the hash of its content so a changed file never maps a stale entry.
+# The fingerprint of each source path is kept next to the cache entries so an
+# unchanged file is not hashed again, and the entry of the previous content of a
+# changed file is removed
+def parseCachePath(cacheDirectory, file):
+    machine = os.path.basename(file).split("_")[0]
+    sourcePath = os.path.join(cacheDirectory, "sources", hashlib.sha1(
+        os.path.realpath(file).encode("utf-8")).hexdigest() + ".json")
+    try:
+        with open(sourcePath, "r") as f:
+            previousEntry = json.load(f)
+    except (OSError, ValueError):
+        previousEntry = None
+
+    entry = fileFingerprint(file, previousEntry)
+    if entry != previousEntry:
+        if previousEntry and previousEntry.get("hash") != entry["hash"]:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(
+                    cacheDirectory, f"{machine}-{previousEntry['hash']}.frames"))
+        os.makedirs(os.path.dirname(sourcePath), exist_ok=True)
+        writeFileAtomically(sourcePath, json.dumps(entry).encode("utf-8"))
+    return os.path.join(cacheDirectory, f"{machine}-{entry['hash']}.frames")
+
+# writes the parsed machine file (path -> frames) to the parse cache through a
+# temporary file renamed into place; the frame arrays are written as they are
+def saveParsedMachineFile(cachePath, parsedFile):
+    frameOffsets = array.array('Q', [0])
+    for frames in parsedFile.values():
+        frameOffsets.append(frameOffsets[-1] + len(frames))
+    stringOffsets, stringTable = packStrings(parsedFile)
+
+    temporaryPath = f"{cachePath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporaryPath, "wb") as f:
+        f.write(parseCacheHeader.pack(
+            parseCacheMagic, parseCacheVersion, binaryByteOrderMark, len(parsedFile),
+            0, frameOffsets[-1], len(stringTable)))
+        f.write(frameOffsets)
+        f.write(stringOffsets)
+        f.write(stringTable)
+        for frames in parsedFile.values():
+            f.write(frames)
+    os.replace(temporaryPath, cachePath)
+
+# maps a parsed machine file from the parse cache; the frames of each path are
+# uint32 views of the mapped file, so nothing is copied. Returns None when the file
+# is missing, of another format version or byte order, or truncated
+def loadParsedMachineFile(cachePath):
+    mappedFile = mapFile(cachePath)
+    if mappedFile is None or len(mappedFile) < parseCacheHeader.size:
+        return None
+    magic, version, byteOrderMark, pathCount, _, frameCount, stringBytes = \
+        parseCacheHeader.unpack_from(mappedFile)
+    frameOffsetsStart = parseCacheHeader.size
+    stringOffsetsStart = frameOffsetsStart + 8 * (pathCount + 1)
+    stringTableStart = stringOffsetsStart + 4 * (pathCount + 1)
+    framesStart = stringTableStart + stringBytes
+    if (magic != parseCacheMagic or version != parseCacheVersion
+            or byteOrderMark != binaryByteOrderMark
+            or len(mappedFile) != framesStart + 4 * frameCount):
+        return None
+
+    view = memoryview(mappedFile)
+    frameOffsets = view[frameOffsetsStart:stringOffsetsStart].cast('Q')
+    stringOffsets = view[stringOffsetsStart:stringTableStart].cast('I')
+    stringTable = view[stringTableStart:framesStart]
+    frames = view[framesStart:].cast('I')
+    parsedFile = {}
+    for pathNumber in range(pathCount):
+        parsedFile[unpackString(stringTable, stringOffsets, pathNumber)] = \
+            frames[frameOffsets[pathNumber]:frameOffsets[pathNumber + 1]]
+    # the modification time is used as the last use for the eviction
+    os.utime(cachePath)
+    return parsedFile
+
+# parses a machine file by the machine in its name line by line while it is read;
+# returns None for machines that are not supported. With --parse-cache a file
+# parsed before is mapped from the cache instead, and a new one is added to it
+def parseMachineFile(file):
+    key = os.path.basename(file)
+    if (not key.startswith(("Baselight", "Flame"))):
+        return
+
+    cachePath = None
+    if (args.parse_cache and os.path.exists(file)):
+        with profileStage("parse cache", 1):
+            cachePath = parseCachePath(args.parse_cache, file)
+            parsedFile = loadParsedMachineFile(cachePath)
+        if parsedFile is not None:
+            return parsedFile
+
+    lines = profileIterator("read", readFileLines(file, args.mmap))
+    if (key.startswith("Baselight")):
+        with profileStage("parse baselight", 1):
+            parsedFile = parseBaselightInfo(lines)
+    else:
+        with profileStage("parse flame", 1):
+            parsedFile = parseFlameInfo(lines)
+
+    if cachePath and parsedFile is not None:
+        with profileStage("parse cache", 1):
+            saveParsedMachineFile(cachePath, parsedFile)
+    return parsedFile
+
+# parses a xytech file line by line while it is read
+def parseXytechFile(file):
+    with profileStage("parse xytech", 1):
+        return parseXytechInfo(profileIterator("read", readFileLines(file)))
 
+
+def parsedMAchineFiles():
     # parsed files
     parsedFiles = {}
 
     if (args.files):
         # parse the machine files
-        for key, file in files.items():
-            if (key.startswith("Baselight")):
-                parsedFiles[key] = parseBaselightInfo(file)
-            elif (key.startswith("Flame")):
-                parsedFiles[key] = parseFlameInfo(file)
+        for file in args.files:
+            parsedFile = parseMachineFile(file)
+            if parsedFile is not None:
+                parsedFiles[os.path.basename(file)] = parsedFile
     return parsedFiles
 
+# returns the date of a work order file name (Xytech_<date>.txt or
+# <machine>_<user>_<date>.txt) or None for other files
+def workOrderDate(file):
+    name = os.path.basename(file)
+    nameParts = os.path.splitext(name)[0].split("_")
+    if name.startswith("Xytech") and len(nameParts) == 2:
+        return nameParts[1]
+    elif name.startswith(("Baselight", "Flame")) and len(nameParts) == 3:
+        return nameParts[2]
+
+# pairs the machine files with the xytech work order of the same date; returns
+# the work orders by date as (xytech file, machine files) and the machine files
+# without a work order
+def pairWorkOrders(paths):
+    xytechFiles = {}
+    machineFiles = {}
+    for path in sorted(paths):
+        date = workOrderDate(path)
+        if date is None:
+            continue
+        if os.path.basename(path).startswith("Xytech"):
+            xytechFiles[date] = path
+        else:
+            machineFiles.setdefault(date, []).append(path)
+
+    workOrders = {date: (xytechFiles[date], machineFiles[date])
+                  for date in sorted(xytechFiles) if date in machineFiles}
+    unpairedFiles = [path for date, paths in machineFiles.items()
+                     if date not in xytechFiles for path in paths]
+    return workOrders, unpairedFiles
+
+# finds the xytech and machine files of the batch (a directory or a glob) and
+# pairs them by date
+def findBatchWorkOrders(batch):
+    if os.path.isdir(batch):
+        paths = glob.glob(os.path.join(batch, "*.txt"))
+    else:
+        paths = glob.glob(batch)
+    return pairWorkOrders(paths)
+
+# parses the xytech file and the machine files of a work order; returns them
+# with the seconds spent on each file
+def parseWorkOrder(xytechFile, machineFiles):
+    timings = []
+    startTime = time.perf_counter()
+    xytech = parseXytechFile(xytechFile)
+    timings.append((xytechFile, time.perf_counter() - startTime))
+
+    parsedFiles = {}
+    for file in machineFiles:
+        startTime = time.perf_counter()
+        parsedFile = parseMachineFile(file)
+        if parsedFile is not None:
+            parsedFiles[os.path.basename(file)] = parsedFile
+        timings.append((file, time.perf_counter() - startTime))
+    return xytech, parsedFiles, timings
+
+# the options read by the parsers and the CSV output, sent with every task of
+# the batch: a worker started with spawn or forkserver imports main again and
+# would only see the default arguments
+batchWorkerOptions = ("verbose", "parse_cache", "mmap", "consolidate")
+
+# the values of the batch options in this process
+def batchOptions():
+    return {name: getattr(args, name) for name in batchWorkerOptions}
+
+# sets the options of the batch in the worker process
+def useBatchOptions(options):
+    for name, value in options.items():
+        setattr(args, name, value)
+
+# parses a work order in a worker process of the DB batch; the frames mapped from
+# the parse cache are copied into arrays as the views of a mapped file can not be
+# sent back to the batch process
+def parseWorkOrderForBatch(xytechFile, machineFiles, options):
+    useBatchOptions(options)
+    xytech, parsedFiles, timings = parseWorkOrder(xytechFile, machineFiles)
+    for parsedFile in parsedFiles.values():
+        for key, frames in parsedFile.items():
+            if isinstance(frames, memoryview):
+                parsedFile[key] = array.array('I')
+                parsedFile[key].frombytes(frames.cast('B'))
+    return xytech, parsedFiles, timings
+
+# parses a work order and writes its output_<date>.csv in the worker process, so
+# only the timings are sent back
+def createCSVFileForWorkOrder(xytechFile, machineFiles, options):
+    useBatchOptions(options)
+    xytech, parsedFiles, timings = parseWorkOrder(xytechFile, machineFiles)
+    startTime = time.perf_counter()
+    createCSVFile(xytech, parsedFiles, args.consolidate)
+    timings.append(("merge and csv", time.perf_counter() - startTime))
+    return timings
+
+# parses and merges every work order of the batch in a pool of processes: with
+# CSV output each work order writes its own output_<date>.csv, with DB output the
+# parsed work orders are stored by this process as they finish; prints the time
+# spent on each file
+def runBatch(batch, output, processes=None):
+    workOrders, unpairedFiles = findBatchWorkOrders(batch)
+    for file in unpairedFiles:
+        print(f"No xytech work order for {file}")
+
+    # only the changed machine files are stored again in incremental mode
+    manifestUpdates = {}
+    if output == "DB" and args.incremental:
+        manifestEntries = loadManifest(args.manifest)
+        for date, (xytechFile, machineFiles) in list(workOrders.items()):
+            changedFiles, manifestUpdates[date] = selectChangedFiles(
+                xytechFile, machineFiles, manifestEntries)
+            if changedFiles:
+                workOrders[date] = (xytechFile, changedFiles)
+            else:
+                del workOrders[date]
+                saveManifest(args.manifest, manifestUpdates[date])
+
+    if not workOrders:
+        if (args.verbose):
+            print("No work orders to process")
+        return
+
+    import concurrent.futures
+    failedWorkOrders = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        workOrderTask = createCSVFileForWorkOrder if output == "CSV" else parseWorkOrderForBatch
+        futures = {date: executor.submit(workOrderTask, xytechFile, machineFiles,
+                                         batchOptions())
+                   for date, (xytechFile, machineFiles) in workOrders.items()}
+        # the work orders are reported in date order
+        for date, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as error:
+                failedWorkOrders += 1
+                print(f"Work order {date} failed: {error}")
+                continue
+            if output == "CSV":
+                timings = result
+            else:
+                xytech, parsedFiles, timings = result
+                startTime = time.perf_counter()
+                storeInMongoDB(xytech, parsedFiles, args.batch_size, args.incremental,
+                               args.consolidate)
+                timings.append(("merge and database", time.perf_counter() - startTime))
+                saveManifest(args.manifest, manifestUpdates.get(date))
+            for file, seconds in timings:
+                print(f"{date} {os.path.basename(file)}: {seconds:.3f}s")
+    if failedWorkOrders:
+        print(f"{failedWorkOrders} of {len(workOrders)} work orders failed")
+
+
+# stores the changed machine files of a work order found in the watched folder;
+# returns the number of machine files stored
+def storeWatchedWorkOrder(xytechFile, machineFiles):
+    changedFiles, manifestUpdates = selectChangedFiles(
+        xytechFile, machineFiles, loadManifest(args.manifest))
+    if changedFiles:
+        xytech, parsedFiles, _ = parseWorkOrder(xytechFile, changedFiles)
+        storeInMongoDB(xytech, parsedFiles, args.batch_size, True, args.consolidate)
+    saveManifest(args.manifest, manifestUpdates)
+    return len(changedFiles)
+
+# writes the counters of the watch-folder service to the stats file
+def writeWatchStats(statsFile, stats):
+    temporaryPath = f"{statsFile}.{os.getpid()}.tmp"
+    with open(temporaryPath, "w") as f:
+        json.dump(stats, f, indent=1)
+    os.replace(temporaryPath, statsFile)
+
+# watches the drop folder and stores new or changed files as soon as they are
+# completely written: the folder is polled every pollInterval seconds and a file
+# is only picked up once its size and modification time did not change for
+# settleSeconds; the work orders of the picked up files are queued and stored one
+# after the other by a worker thread over the shared mongo client. The queue
+# depth, the files stored and the latency from saving a file to having it stored
+# are printed with --verbose and written to statsFile. Runs until interrupted
+def watchFolder(folder, pollInterval=2.0, settleSeconds=5.0, statsFile=None):
+    stats = {"queueDepth": 0, "workOrdersStored": 0, "filesStored": 0, "failed": 0,
+             "lastLatencySeconds": None, "averageLatencySeconds": None,
+             "maxLatencySeconds": None}
+    statsLock = threading.Lock()
+    workQueue = queue.Queue()
+    # completely written files by path as (size, modification time)
+    stableFiles = {}
+    # dates waiting in the queue with the save time of their oldest new file
+    pendingDates = {}
+
+    def storeQueuedWorkOrders():
+        totalLatency = 0
+        while True:
+            date = workQueue.get()
+            if date is None:
+                return
+            with statsLock:
+                savedTime = pendingDates.pop(date)
+                workOrders, _ = pairWorkOrders(stableFiles)
+            try:
+                # machine files wait for the xytech work order of their date
+                storedFiles = 0
+                if date in workOrders:
+                    storedFiles = storeWatchedWorkOrder(*workOrders[date])
+            except Exception as error:
+                print(f"Work order {date} failed: {error}")
+                with statsLock:
+                    stats["failed"] += 1
+                    stats["queueDepth"] = workQueue.qsize()
+                    if statsFile:
+                        writeWatchStats(statsFile, stats)
+                continue
+            latency = time.time() - savedTime
+            with statsLock:
+                stats["queueDepth"] = workQueue.qsize()
+                if storedFiles:
+                    stats["workOrdersStored"] += 1
+                    stats["filesStored"] += storedFiles
+                    totalLatency += latency
+                    stats["lastLatencySeconds"] = latency
+                    stats["averageLatencySeconds"] = totalLatency / stats["workOrdersStored"]
+                    stats["maxLatencySeconds"] = max(stats["maxLatencySeconds"] or 0, latency)
+                if statsFile:
+                    writeWatchStats(statsFile, stats)
+            if (args.verbose and storedFiles):
+                print(f"Stored {storedFiles} file(s) of {date}, latency {latency:.1f}s, "
+                      f"queue depth {stats['queueDepth']}")
+
+    worker = threading.Thread(target=storeQueuedWorkOrders, daemon=True)
+    worker.start()
+
+    # files being written by path as (size, modification time, unchanged since)
+    changingFiles = {}
+    try:
+        while True:
+            now = time.time()
+            seenPaths = set()
+            for entry in os.scandir(folder):
+                if not entry.is_file() or workOrderDate(entry.name) is None:
+                    continue
+                try:
+                    entryStat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                seenPaths.add(entry.path)
+                fileState = (entryStat.st_size, entryStat.st_mtime_ns)
+                if stableFiles.get(entry.path) == fileState:
+                    continue
+                if changingFiles.get(entry.path, (None, None, None))[:2] != fileState:
+                    changingFiles[entry.path] = (*fileState, now)
+                    continue
+                if now - changingFiles[entry.path][2] < settleSeconds:
+                    continue
+
+                # the file is completely written, queue its work order once
+                del changingFiles[entry.path]
+                date = workOrderDate(entry.name)
+                with statsLock:
+                    stableFiles[entry.path] = fileState
+                    if date not in pendingDates:
+                        pendingDates[date] = entryStat.st_mtime
+                        workQueue.put(date)
+                    else:
+                        pendingDates[date] = min(pendingDates[date], entryStat.st_mtime)
+                    stats["queueDepth"] = workQueue.qsize()
+
+            # files deleted or renamed since the last pass are no longer part of
+            # their work order
+            for path in [path for path in changingFiles if path not in seenPaths]:
+                del changingFiles[path]
+            with statsLock:
+                for path in [path for path in stableFiles if path not in seenPaths]:
+                    del stableFiles[path]
+            time.sleep(pollInterval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        workQueue.put(None)
+        worker.join()
+    return stats
+
 
 def parsedXytechFile():
     # xytech file
@@ -485,139 +2550,235 @@ def parsedXytechFile():
     xyTechParsedInfo = None
     if (xyTechInfo):
         # parse the xytech file
-        xyTechParsedInfo = parseXytechInfo(xyTechInfo)
+        with profileStage("parse xytech", 1):
+            xyTechParsedInfo = parseXytechInfo(xyTechInfo)
     return xyTechParsedInfo
 
-if (args.output == "CSV"):
+# the CSV workflow: writes output_<date>.csv of the xytech and machine files, or
+# of every work order of the batch; returns the exit status
+def csvWorkflow():
+    if (args.batch):
+        runBatch(args.batch, args.output, args.processes)
+        return 0
+
     checkFile(args.xytech)
     checkFile(args.files)
-    
+
     xyTechParsedInfo = parsedXytechFile();
     parsedFiles = parsedMAchineFiles();
-    
+
     if (not xyTechParsedInfo and not parsedFiles):
         if (args.verbose):
             print("No files to parse")
-        sys.exit(2)
-    
-    createCSVFile(xyTechParsedInfo, parsedFiles)
-    myClient.close()
-elif (args.output == "DB"):
-    checkFile(args.xytech)
-    checkFile(args.files)
+        return 2
+
+    createCSVFile(xyTechParsedInfo, parsedFiles, args.consolidate)
+    return 0
+
+# the DB workflow: stores the xytech and machine files (or the batch, or the
+# files dropped in the watched folder) and prints the reports
+def dbWorkflow():
+    if (args.watch):
+        watchFolder(args.watch, args.poll_interval, args.settle_seconds, args.stats_file)
+    elif (args.batch):
+        runBatch(args.batch, args.output, args.processes)
+    else:
+        checkFile(args.xytech)
+        checkFile(args.files)
+
+        # only the changed machine files are parsed and stored again
+        manifestUpdates = []
+        if (args.incremental and args.xytech and args.files):
+            args.files, manifestUpdates = selectChangedFiles(
+                args.xytech, args.files, loadManifest(args.manifest))
+
+        # the consolidation needs every file of the work order before the first write
+        if (args.pipeline == "async" and args.xytech and not args.consolidate):
+            import asyncio
+            asyncio.run(storeInMongoDBAsync(args.xytech, args.files or [], args.batch_size,
+                                            args.incremental, args.db_concurrency))
+        else:
+            xyTechParsedInfo = parsedXytechFile();
+            parsedFiles = parsedMAchineFiles();
 
-    xyTechParsedInfo = parsedXytechFile();
-    parsedFiles = parsedMAchineFiles();
-    
-    if (not xyTechParsedInfo and not parsedFiles):
-        if (args.verbose):
-            print("No files to read from")
-        sys.exit(2)
+            if (not xyTechParsedInfo and not parsedFiles):
+                if (args.verbose):
+                    print("No files to read from")
+                return 2
 
-    storeInMongoDB(xyTechParsedInfo, parsedFiles)
+            storeInMongoDB(xyTechParsedInfo, parsedFiles, args.batch_size, args.incremental,
+                           args.consolidate)
+        saveManifest(args.manifest, manifestUpdates)
     # print results
 
     # creates or gets the database called video files
-    videoFiles = myClient["videoFiles"]
+    videoFiles = mongoClient()["videoFiles"]
 
-    # gets the employee collection from the database
-    employeeCollection = videoFiles["employee"]
+    if (args.pipeline == "async"):
+        import asyncio
+        asyncio.run(printReportsAsync(videoFiles, args.db_concurrency))
+    else:
+        printReports(videoFiles)
+    return 0
+
+# the XLS workflow: writes the report of the stored frames within the video with
+# the thumbnail of each range
+def xlsWorkflow():
+    global frame_per_second
+    if (not args.process or not os.path.exists(args.process)):
+        if (args.verbose):
+            print("No process file specified or missing")
+        return 2
+
+    # creates or gets the database called video files
+    videoFiles = mongoClient()["videoFiles"]
 
     # gets the frame collection from the database
     frameCollection = videoFiles["frame"]
 
-    print("1). Work done by TDanza\n")
-    printWorkDoneByUser(frameCollection, "TDanza")
-
-    print("2). Work done before 3-25-2023 date on a flame machine\n")
-    printWorkDoneBeforeDateAndMachine(
-        frameCollection, datetime.datetime(2023, 3, 25), "Flame")
-
-    print("3). Work done on hpsans13 on date 3-26-2023\n")
-    printWorkDoneOnAndDate(frameCollection, 'hpsans13',
-                           datetime.datetime(2023, 3, 26))
-    print("4). Name of all users who worked on a flame machine\n")
-    printAllUsersByMachineType(employeeCollection, "Flame")
-    # close the connection of the database
-    myClient.close()
-elif (args.output == "XLS"):
-    if (args.process and os.path.exists(args.process)):
-        
-        # creates or gets the database called video files
-        videoFiles = myClient["videoFiles"]
-
-        # gets the frame collection from the database
-        frameCollection = videoFiles["frame"]
-
-        # runs ffprobe to get the duration in seconds of the video
-        ffprobeOutput = ['ffprobe', '-v', 'error', '-show_entries',
-                         'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', args.process]
-        
-        # get the fps of the video by running ffprobe
-        ffProbeFPS = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries',
-                            'stream=r_frame_rate', '-of', 'default=noprint_wrappers=1:nokey=1', args.process]
-        ffProbeFPS = subprocess.check_output(ffProbeFPS)
-        
-        # if the ffProbeFPS is not empty, then get the fps of the video otherwise keep it as 60
-        if ffProbeFPS:
-            frame_per_second = int(ffProbeFPS.decode("utf-8").split("/")[0])
-
-        # Run ffprobe command and capture output
-        ffprobeOutput = subprocess.check_output(ffprobeOutput)
-
-        # Convert duration from seconds to timecode format (hh:mm:ss:ff)
-        durationSeconds = float(ffprobeOutput.strip())
-        timeCode = secondsToTimeCode(durationSeconds)
+    # probes the video once for its frame rate and number of frames
+    with profileStage("ffprobe", 1):
+        videoInfo = probeVideo(args.process, args.thumbnail_cache)
+    frame_per_second = videoInfo["framesPerSecond"]
 
+    # frames are numbered from 0 like ffmpeg does, so the last frame
+    # of the video is one less than the number of frames
+    with profileStage("frame query") as stage:
         informationToStore = findAllFramesWithinVideo(
-            timeCodeToFrames(timeCode), frameCollection)
-
-        # create a directory called snapshots if it does not exist to temporarily store all the thumbnails
-        if not os.path.exists("snapshots"):
-            subprocess.run(["mkdir", "-p", "snapshots"])
-
-        # create a new workbook
-        workbook = xlsxwriter.Workbook('video-information.xls')
-
-        # adds a sheet to the workbook
-        sheet = workbook.add_worksheet("Video Information")
-
-        # headers for the sheet
-        sheet.write(0, 0, "Location")
-        sheet.write(0, 1, "Frame Range")
-        sheet.write(0, 2, "Time Code Range")
-        sheet.write(0, 3, "Thumbnail")
-
-        for i, info in enumerate(informationToStore):
-            location = info["location"]
-            frameRange = info["frameRange"]
-            middleFrame = info["middleFrame"]
-            timeCode = info["timeCode"]
-            timeCodeRange = info["timeCodeRange"]
-            imagePath = f"./snapshots/{middleFrame}.png"
-           
-           
-            ff = ffmpy.FFmpeg(inputs={args.process: None}, outputs={
-                              imagePath: f"-ss {timeCode} -vframes 1 -f image2  -r 60 -s 96x74 -y"})
-            ff.run()
-            sheet.write(i+1, 0, location)
-            sheet.write(i+1, 1, frameRange)
-            sheet.write(i+1, 2, timeCodeRange)
-            # save the image to the sheet
-            sheet.insert_image(i+1, 3, imagePath)
-
-        # close the workbook and saves it
-        workbook.close()
-        # remove the snapshots directory along with all the images in it after the workbook is created
-        subprocess.run(["rm", "-rf", "snapshots"])
-        myClient.close()
+            videoInfo["frameCount"] - 1, frameCollection)
+        stage["items"] += len(informationToStore)
+
+    # the rows are written in the order of their middle frames, the order the
+    # batch mode extracts them in, so each thumbnail is written as soon as it is
+    # extracted
+    informationToStore.sort(key=lambda info: (
+        info["middleFrame"], info["location"], info["frameRange"]))
+
+    # every middle frame is extracted once even if several ranges share it
+    thumbnailFrames = list(dict.fromkeys(
+        info["middleFrame"] for info in informationToStore))
+    if (args.thumbnail_mode == "batch"):
+        def extract(frames):
+            return extractThumbnailsInBatches(
+                args.process, frames, args.workers, args.thumbnail_timeout,
+                cacheDirectory=args.thumbnail_cache)
+    else:
+        def extract(frames):
+            return extractThumbnails(
+                args.process, frames, args.workers, args.thumbnail_timeout,
+                args.thumbnail_cache)
+
+    # only the thumbnails missing from the cache are extracted
+    cacheStats = {"hits": 0, "misses": 0, "evicted": 0}
+    if (args.thumbnail_cache):
+        thumbnails = extractThumbnailsWithCache(
+            args.process, thumbnailFrames, args.thumbnail_cache, extract, cacheStats)
     else:
+        thumbnails = extract(thumbnailFrames)
+
+    # the rows are written to the report as their thumbnails are extracted
+    failedThumbnails = []
+    reportStats = writeReport(
+        args.report, thumbnailRows(informationToStore, profileIterator(
+            "ffmpeg", thumbnails), failedThumbnails),
+        args.report_row_limit, args.report_split, args.report_image_budget * 1024 * 1024)
+    thumbnails.close()
+
+    if failedThumbnails:
+        print(f"Failed to extract {len(failedThumbnails)} thumbnails")
         if (args.verbose):
-            print("No process file specified or missing")
-        myClient.close()
-        sys.exit(2)
-else:
+            for middleFrame, error in failedThumbnails:
+                print(f"frame {middleFrame}: {error}")
+
+    if (args.thumbnail_cache):
+        evictCacheFiles(
+            args.thumbnail_cache, args.thumbnail_cache_size * 1024 * 1024, cacheStats)
+        if (args.verbose):
+            print(f"thumbnail cache hits: {cacheStats['hits']}, "
+                  f"misses: {cacheStats['misses']}, evicted: {cacheStats['evicted']}")
+
+    if (args.verbose):
+        print(f"report: {reportStats['rows']} rows in {reportStats['files']} file(s), "
+              f"{reportStats['rowsPerSecond']:.1f} rows/sec, "
+              f"peak RSS {reportStats['peakRssMB']:.1f} MB")
+    return 0
+
+# the MIGRATE workflow: brings the frames stored by older versions up to date
+def migrateWorkflow():
+    # adds frame_start and frame_end to the frames stored by older versions
+    migratedFrames = migrateFrameRanges(mongoClient()["videoFiles"]["frame"])
+    # adds machine and host to the frames and rebuilds the work summary
+    migratedSummaries = migrateWorkSummary(mongoClient()["videoFiles"])
     if (args.verbose):
-        print("Output parameter is empty or not supported or not passed in")
-    myClient.close()
-    sys.exit(2)
\ No newline at end of file
+        print(f"Migrated {migratedFrames} frame documents")
+        print(f"Added the machine or host to frame documents {migratedSummaries} times")
+    return 0
+
+# the QUERY workflow: builds the frame index of the xytech and machine files or of
+# every work order of the batch and saves it to --index, or reads the saved one,
+# and prints the ranges touching --frames as location,range,user,machine,date
+def queryWorkflow():
+    if (args.batch or (args.xytech and args.files)):
+        if (args.batch):
+            workOrders, unpairedFiles = findBatchWorkOrders(args.batch)
+            for file in unpairedFiles:
+                print(f"No xytech work order for {file}")
+            workOrders = workOrders.values()
+        else:
+            workOrders = [(args.xytech, args.files)]
+        mergedFiles = []
+        for xytechFile, machineFiles in workOrders:
+            xytech, parsedFiles, _ = parseWorkOrder(xytechFile, machineFiles)
+            mergedFiles.extend(mergeMachineFilesByPath(xytech, parsedFiles).items())
+        frameIndex = buildFrameIndex(mergedFiles)
+        saveFrameIndex(args.index, frameIndex)
+        if (args.verbose):
+            print(f"Indexed {len(frameIndex['locations'])} locations of "
+                  f"{len(frameIndex['sources'])} files in {args.index}")
+    else:
+        with profileStage("frame index load", 1):
+            frameIndex = loadFrameIndex(args.index)
+        if frameIndex is None:
+            if (args.verbose):
+                print(f"No frame index at {args.index}")
+            return 2
+
+    if (args.frames):
+        firstFrame, lastFrame = frameRangeBounds(args.frames)
+        with profileStage("frame index query") as stage:
+            for location, start, end, source in queryFrameIndex(
+                    frameIndex, firstFrame, lastFrame, args.location):
+                machine, user, date = os.path.splitext(source)[0].split("_")
+                print(f"{location},{formatFrameRange(start, end)},{user},{machine},{date}")
+                stage["items"] += 1
+    return 0
+
+# the function of each subcommand
+workflows = {
+    "csv": csvWorkflow,
+    "db": dbWorkflow,
+    "xls": xlsWorkflow,
+    "migrate": migrateWorkflow,
+    "query": queryWorkflow,
+}
+
+# runs the workflow of the command line arguments (sys.argv when argv is None)
+# and returns its exit status; the database connection is closed, the parse
+# cache trimmed to its size and the profile written however the workflow ends
+def main(argv=None):
+    global args
+    args = parseArguments(sys.argv[1:] if argv is None else argv)
+    startTime = time.perf_counter()
+    try:
+        return workflows[args.workflow]()
+    finally:
+        closeMongoClient()
+        if (args.parse_cache and args.workflow in ("csv", "db", "query")
+                and os.path.isdir(args.parse_cache)):
+            evictCacheFiles(args.parse_cache, args.parse_cache_size * 1024 * 1024,
+                                {"evicted": 0})
+        if (args.profile):
+            writeProfile(args.profile, startTime)
+
+if __name__ == "__main__":
+    sys.exit(main())